@@ -4,19 +4,44 @@ GitHub to Skill - 一键将 GitHub 仓库转换为 OpenCode Skill
 
 Usage:
     python github_to_skill.py <github_url> [output_dir]
+    python github_to_skill.py --batch <urls_file|-> [output_dir] [--concurrency N]
+    (两种模式都支持 --readme-max-bytes N 和 --full-tree)
+
+    --batch        批量导入：从文件（- 表示 stdin）读取 URL，每行一个，# 开头为注释。
+                   所有仓库并发探测，共用 keep-alive 连接，每个仓库完成时输出一行 JSON (NDJSON)，
+                   最后输出一行 summary
+    --concurrency  批量模式同时处理的仓库数
+    --readme-max-bytes  基于 README 生成 SKILL.md 时写入的正文字节上限
+                   （默认 512 KiB，或 GITHUB_TO_SKILL_README_MAX_BYTES），超出部分截断并注明原文地址；
+                   README 流式读取，内联的 data: URI 图片会被删除
+    --full-tree    完整导入：一次下载仓库 archive，写入 subdir 下的全部文件（不生成占位 wrapper），
+                   并在 frontmatter 中记录 tracked_files（路径和 blob SHA，不含 SKILL.md），
+                   之后 skill-manager 检查更新时只对比这些文件的 hash。
+                   SHA 取自该 commit 的 tree（一次 Trees API 请求）；archive 中被 export-subst 改写
+                   或被 export-ignore 排除的文件从 raw 地址重新下载
 
 Examples:
     python github_to_skill.py https://github.com/user/repo
     python github_to_skill.py https://github.com/user/repo ~/.config/opencode/skills
     python github_to_skill.py https://github.com/user/repo/tree/main/subdir
+    cat urls.txt | python github_to_skill.py --batch - ./my-skills
 """
 
 import sys
 import os
 import json
+import time
+import codecs
+import hashlib
+import itertools
+import tarfile
 import datetime
+import argparse
+import threading
 import subprocess
-import urllib.request
+import concurrent.futures
+import http.client
+import urllib.parse
 import re
 import yaml
 
@@ -46,6 +71,296 @@ def get_default_skills_dir():
 # 默认输出路径
 DEFAULT_OUTPUT_DIR = get_default_skills_dir()
 
+# raw 文件地址，测试时可指向本地服务
+RAW_BASE_URL = os.getenv("GITHUB_RAW_URL", "https://raw.githubusercontent.com").rstrip('/')
+# 仓库 archive 地址（--full-tree 使用，不消耗 API 配额）
+CODELOAD_BASE_URL = os.getenv("GITHUB_CODELOAD_URL", "https://codeload.github.com").rstrip('/')
+# --full-tree 读取 commit tree 时使用的 API 地址
+API_BASE_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip('/')
+ARCHIVE_TIMEOUT = 60
+DEFAULT_BATCH_CONCURRENCY = 16
+MAX_CONNECTIONS_PER_HOST = 16
+MAX_REDIRECTS = 3
+# README 按 chunk 流式读取；写入 SKILL.md 的 README 正文字节上限（--readme-max-bytes 可覆盖）
+README_CHUNK_SIZE = 64 * 1024
+README_MAX_BYTES = int(os.getenv("GITHUB_TO_SKILL_README_MAX_BYTES", str(512 * 1024)))
+
+# 进度信息输出位置；批量模式下 stdout 只输出 NDJSON，进度改写到 stderr
+LOG_STREAM = sys.stdout
+
+
+def log(message):
+    print(message, file=LOG_STREAM)
+
+
+class PooledResponse:
+    """连接池中的一个响应；读完后连接放回池中，未读完就关闭的连接直接丢弃"""
+
+    def __init__(self, pool, key, conn, response):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._response = response
+        self.status = response.status
+        self.headers = response.headers
+
+    def read(self, amt=None):
+        return self._response.read(amt)
+
+    def close(self):
+        if self._conn is None:
+            return
+        reusable = self._response.isclosed() and not self._response.will_close
+        if reusable:
+            self._pool._release(self._key, self._conn)
+        else:
+            self._conn.close()
+        self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HttpPool:
+    """
+    按 host 复用 keep-alive 连接的最小连接池（线程安全）。
+    本 skill 独立分发，不依赖 skill-manager 的 http_client。
+    """
+
+    def __init__(self, max_per_host=MAX_CONNECTIONS_PER_HOST):
+        self.max_per_host = max_per_host
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'opened': 0, 'reused': 0}
+
+    def _connect(self, key, timeout):
+        with self._lock:
+            self.stats['opened'] += 1
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return cls(host, port, timeout=timeout)
+
+    def _acquire(self, key, timeout):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.stats['reused'] += 1
+                conn = idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+        return self._connect(key, timeout), False
+
+    def _release(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def open(self, url, timeout=10, headers=None):
+        """GET url 并返回 PooledResponse（需 close 或用 with），自动跟随重定向"""
+        request_headers = {'User-Agent': 'github-to-skills'}
+        request_headers.update(headers or {})
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urllib.parse.urlsplit(url)
+            key = (parts.scheme, parts.hostname, parts.port)
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+            with self._lock:
+                self.stats['requests'] += 1
+            conn, reused = self._acquire(key, timeout)
+            try:
+                conn.request('GET', path, headers=request_headers)
+                response = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if not reused:
+                    raise
+                # 服务端已关闭的空闲连接，换新连接重试一次
+                conn = self._connect(key, timeout)
+                try:
+                    conn.request('GET', path, headers=request_headers)
+                    response = conn.getresponse()
+                except Exception:
+                    conn.close()
+                    raise
+            except Exception:
+                conn.close()
+                raise
+            resp = PooledResponse(self, key, conn, response)
+            location = response.headers.get('Location')
+            if response.status in (301, 302, 303, 307, 308) and location:
+                resp.read()
+                resp.close()
+                new_url = urllib.parse.urljoin(url, location)
+                if urllib.parse.urlsplit(new_url).netloc != parts.netloc:
+                    # 跨 host 重定向不能带上 token
+                    request_headers.pop('Authorization', None)
+                url = new_url
+                continue
+            return resp
+        raise Exception(f"Too many redirects: {url}")
+
+
+_pool = HttpPool()
+
+
+class RemoteText:
+    """
+    已收到响应头的远程文本文件：head 是已解码的第一个 chunk，
+    其余部分由 iter_rest() 流式读取，不会整体读入内存。用完需 close()。
+    """
+
+    def __init__(self, url, response, chunk_size=README_CHUNK_SIZE):
+        self.url = url
+        self.chunk_size = chunk_size
+        self._response = response
+        self._decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self.head = self._decoder.decode(response.read(chunk_size))
+
+    def iter_rest(self):
+        while True:
+            data = self._response.read(self.chunk_size)
+            if not data:
+                break
+            yield self._decoder.decode(data)
+        tail = self._decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+    def read(self):
+        return self.head + ''.join(self.iter_rest())
+
+    def close(self):
+        self._response.close()
+
+
+# (开头标记, 结束字符)：markdown 图片 ![alt](data:...) 与 HTML <img src="data:...">
+_DATA_URI_MARKERS = (('](data:', ')'), ('src="data:', '"'), ("src='data:", "'"))
+_MARKER_TAIL = max(len(marker) for marker, _ in _DATA_URI_MARKERS) - 1
+
+
+class DataUriStripper:
+    """
+    流式删除内联的 data: URI 图片（通常是大段 base64），只保留空链接，例如 ![logo]()。
+    标记和 URI 都可以跨 chunk。
+    """
+
+    def __init__(self):
+        self._pending = ''
+        self._skip_until = None
+
+    def feed(self, text):
+        text = self._pending + text
+        self._pending = ''
+        out = []
+        pos = 0
+        while True:
+            if self._skip_until:
+                end = text.find(self._skip_until, pos)
+                if end < 0:
+                    return ''.join(out)
+                # 结束字符保留在输出中
+                pos = end
+                self._skip_until = None
+            best = None
+            for marker, terminator in _DATA_URI_MARKERS:
+                i = text.find(marker, pos)
+                if i >= 0 and (best is None or i < best[0]):
+                    best = (i, marker, terminator)
+            if best is None:
+                # 末尾可能是被 chunk 截断的标记，留到下一次
+                cut = max(pos, len(text) - _MARKER_TAIL)
+                out.append(text[pos:cut])
+                self._pending = text[cut:]
+                return ''.join(out)
+            i, marker, terminator = best
+            keep = i + len(marker) - len('data:')
+            out.append(text[pos:keep])
+            pos = keep
+            self._skip_until = terminator
+
+    def flush(self):
+        rest = '' if self._skip_until else self._pending
+        self._pending = ''
+        return rest
+
+
+def fetch_first_candidate(candidates, timeout=10):
+    """
+    并发请求候选文件 [(label, url)]（按优先级从高到低排列）。
+    优先级最高的成功结果一确定就返回，其余请求取消：未开始的不再发出，已收到响应的直接关闭。
+    返回 (label, RemoteText, timings)，全部失败时 label 和 RemoteText 为 None；
+    RemoteText 只读取了第一个 chunk，由调用方继续读取并 close()。
+    timings: {label: {"status": HTTP 状态码 / "error" / "cancelled", "elapsed": 秒（到收到第一个 chunk）}}
+    """
+    cancelled = threading.Event()
+    # 保护 cancelled 与 opened：取消之后打开的响应由请求线程自己关闭，之前的由这里关闭
+    lock = threading.Lock()
+    opened = []
+    timings = {}
+    
+    def fetch(label, url):
+        start = time.monotonic()
+        status = "cancelled"
+        remote = None
+        response = None
+        try:
+            if not cancelled.is_set():
+                response = _pool.open(url, timeout=timeout)
+                status = response.status
+                if status == 200 and not cancelled.is_set():
+                    remote = RemoteText(url, response)
+                else:
+                    if not cancelled.is_set():
+                        # 读完错误页，连接可以复用
+                        response.read()
+                    response.close()
+        except Exception:
+            status = "error"
+            if response is not None:
+                response.close()
+        if remote is not None:
+            with lock:
+                if cancelled.is_set():
+                    remote.close()
+                    remote = None
+                    status = "cancelled"
+                else:
+                    opened.append(remote)
+        timings[label] = {"status": status, "elapsed": round(time.monotonic() - start, 3)}
+        return remote
+    
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(candidates))
+    futures = [executor.submit(fetch, label, url) for label, url in candidates]
+    winner, winner_remote = None, None
+    try:
+        for (label, _), future in zip(candidates, futures):
+            remote = future.result()
+            if remote is not None:
+                winner, winner_remote = label, remote
+                break
+    finally:
+        with lock:
+            cancelled.set()
+            for remote in opened:
+                if remote is not winner_remote:
+                    remote.close()
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+    
+    # 被取消的请求可能还没有写入耗时
+    result_timings = {label: timings.get(label, {"status": "cancelled"}) for label, _ in candidates}
+    return winner, winner_remote, result_timings
+
 
 def parse_github_url(url):
     """
@@ -71,9 +386,67 @@ def parse_github_url(url):
     return clean_url, "", "main"
 
 
+# repo_url -> Future[refs]；同一进程（批量模式）中每个仓库只执行一次 ls-remote，
+# 同时导入同一仓库的多个子目录时也只有一个调用在进行
+_refs_cache = {}
+_refs_lock = threading.Lock()
+
+
+def _ls_remote(repo_url):
+    """一次 ls-remote 读取 HEAD 指向的默认分支和全部分支，失败时返回 None"""
+    try:
+        result = subprocess.run(
+            ['git', 'ls-remote', '--symref', repo_url, 'HEAD', 'refs/heads/*'],
+            capture_output=True,
+            text=True,
+            timeout=10
+        )
+    except Exception:
+        return None
+    if result.returncode != 0:
+        return None
+    refs = {"default_branch": None, "branches": {}}
+    for line in result.stdout.splitlines():
+        target, _, name = line.partition('\t')
+        if target.startswith('ref: '):
+            if name == 'HEAD' and target[5:].startswith('refs/heads/'):
+                refs["default_branch"] = target[len('ref: refs/heads/'):]
+        elif name.startswith('refs/heads/'):
+            refs["branches"][name[len('refs/heads/'):]] = target
+    return refs
+
+
+def get_remote_refs(repo_url):
+    """
+    返回 {"default_branch": 名称或 None, "branches": {分支名: commit SHA}}，失败时返回 None。
+    结果按 repo_url 缓存。
+    """
+    with _refs_lock:
+        future = _refs_cache.get(repo_url)
+        owner = future is None
+        if owner:
+            future = concurrent.futures.Future()
+            _refs_cache[repo_url] = future
+    if owner:
+        future.set_result(_ls_remote(repo_url))
+    return future.result()
+
+
+def pick_branch(refs, branch=None):
+    """按优先级选择分支：URL 指定的分支 > 默认分支 > main > master，返回 (branch, sha)"""
+    if not refs:
+        return None, None
+    candidates = [branch, refs["default_branch"], "main", "master"]
+    for name in candidates:
+        if name and name in refs["branches"]:
+            return name, refs["branches"][name]
+    return None, None
+
+
 def get_repo_info(url):
     """
     获取仓库信息：名称、描述、最新 commit hash、README 内容、以及 SKILL.md (如果存在)
+    README 只读取第一个 chunk，返回的 readme 需要 close_repo_info() 或 create_skill() 关闭
     """
     repo_url, subdir, branch = parse_github_url(url)
     
@@ -83,66 +456,63 @@ def get_repo_info(url):
     else:
         repo_name = repo_url.split('/')[-1]
     
-    # 1. 获取最新 commit hash (尝试多个分支)
-    latest_hash = "unknown"
-    branches_to_try = [branch, "main", "master"] if branch not in ["main", "master"] else ["main", "master"]
+    # 各阶段耗时（秒），写入 JSON 输出
+    timings = {}
+    start = time.monotonic()
     
-    for try_branch in branches_to_try:
-        try:
-            result = subprocess.run(
-                ['git', 'ls-remote', repo_url, f'refs/heads/{try_branch}'],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            if result.stdout.strip():
-                latest_hash = result.stdout.split()[0]
-                branch = try_branch  # 更新为实际找到的分支
-                break
-        except Exception:
-            continue
+    # 1. 获取最新 commit hash：一次 ls-remote 拿到全部分支，在本地选择分支
+    #    URL 未指定分支（没有 /tree/）时优先使用仓库的默认分支
+    latest_hash = "unknown"
+    requested = branch if '/tree/' in url else None
+    found_branch, sha = pick_branch(get_remote_refs(repo_url), requested)
+    timings["ls_remote"] = round(time.monotonic() - start, 3)
+    if sha:
+        latest_hash = sha
+        branch = found_branch  # 更新为实际找到的分支
     
     if latest_hash == "unknown":
-        print(f"Warning: 无法获取 git hash", file=sys.stderr)
+        print(f"Warning: 无法获取 git hash: {repo_url}", file=sys.stderr)
+    
+    # skill-manager 从 github_url 推断分支（没有 /tree/ 时为 main）。
+    # 实际使用的分支不同（例如默认分支是 develop）时，把分支写进 github_url
+    github_url = url
+    if branch != parse_github_url(url)[2]:
+        github_url = f"{repo_url}/tree/{branch}" + (f"/{subdir}" if subdir else "")
+    
+    raw_base = RAW_BASE_URL + repo_url.split("github.com", 1)[1] if "github.com" in repo_url else repo_url
     
-    raw_base = repo_url.replace("github.com", "raw.githubusercontent.com")
+    # 2. 并发获取 SKILL.md 和 README，优先级 SKILL.md > README.md > readme.md
+    #    有 SKILL.md 时不再使用 README
+    prefix = f"{raw_base}/{branch}/{subdir}" if subdir else f"{raw_base}/{branch}"
+    candidates = [(name, f"{prefix}/{name}") for name in ("SKILL.md", "README.md", "readme.md")]
+    fetch_start = time.monotonic()
+    found, content, candidate_timings = fetch_first_candidate(candidates)
+    timings["candidates"] = round(time.monotonic() - fetch_start, 3)
+    timings["files"] = candidate_timings
     
-    # 2. 尝试获取 SKILL.md
     skill_md_content = None
-    skill_md_url = f"{raw_base}/{branch}/{subdir}/SKILL.md" if subdir else f"{raw_base}/{branch}/SKILL.md"
-    try:
-        with urllib.request.urlopen(skill_md_url, timeout=5) as response:
-            skill_md_content = response.read().decode('utf-8')
-            print("Found existing SKILL.md in remote repository.")
-    except Exception:
-        pass
-    
-    # 3. 获取 README
-    readme_content = ""
-    if not skill_md_content: # 如果有 SKILL.md，README 优先级降低，但还是获取一下
-        # 构建 README 路径
-        readme_paths = [
-            f"{raw_base}/{branch}/{subdir}/README.md" if subdir else f"{raw_base}/{branch}/README.md",
-            f"{raw_base}/{branch}/{subdir}/readme.md" if subdir else f"{raw_base}/{branch}/readme.md",
-        ]
-        
-        for readme_url in readme_paths:
-            try:
-                with urllib.request.urlopen(readme_url, timeout=10) as response:
-                    readme_content = response.read().decode('utf-8')
-                    break
-            except Exception:
-                continue
+    readme = None
+    if found == "SKILL.md":
+        try:
+            skill_md_content = content.read()
+        finally:
+            content.close()
+        log("Found existing SKILL.md in remote repository.")
+    elif found:
+        readme = content
+    timings["total"] = round(time.monotonic() - start, 3)
     
     return {
         "name": repo_name,
         "url": url,
+        "github_url": github_url,  # 写入 frontmatter，包含实际使用的分支
         "repo_url": repo_url,
         "subdir": subdir,
         "branch": branch,
         "latest_hash": latest_hash,
-        "readme": readme_content, # 不再截断
-        "skill_md": skill_md_content
+        "readme": readme, # RemoteText 或 None，create_skill 流式写入（按 README_MAX_BYTES 截断）
+        "skill_md": skill_md_content,
+        "timings": timings
     }
 
 
@@ -169,18 +539,268 @@ def update_frontmatter(content, new_metadata):
         return content
 
 
-def create_skill(repo_info, output_dir):
+def skill_dir_name(name):
+    """规范化名称，作为 skill 目录名"""
+    return "".join(c if c.isalnum() or c in ('-', '_') else '-' for c in name).lower()
+
+
+def close_repo_info(repo_info):
+    """关闭 get_repo_info 留下的 README 流（可重复调用）"""
+    if repo_info.get('readme') is not None:
+        repo_info['readme'].close()
+
+
+def write_readme_body(f, texts, max_bytes):
+    """
+    依次写入 README 文本块，累计超过 max_bytes 字节时在最后一个完整行处截断并停止读取。
+    返回 (写入字节数, 是否截断)
+    """
+    written = 0
+    for text in texts:
+        data = text.encode('utf-8')
+        if written + len(data) > max_bytes:
+            allowed = data[:max_bytes - written]
+            newline = allowed.rfind(b'\n')
+            if newline >= 0:
+                allowed = allowed[:newline + 1]
+            f.write(allowed.decode('utf-8', 'ignore'))
+            return written + len(allowed), True
+        f.write(text)
+        written += len(data)
+    return written, False
+
+
+def _description_line(line):
+    """可作为描述的行；跳过空行、标题、分隔线以及图片 / badge / HTML 行"""
+    line = line.strip()
+    if line and not line.startswith(('#', '---', '![', '[![', '<')):
+        return line[:200]
+    return None
+
+
+def read_description(texts, max_bytes):
+    """
+    从已清理（删除 data: URI）的 README 文本流中找第一行可用的描述，
+    最多预读 max_bytes 字节（超出部分反正会被截断）。
+    返回 (描述或 None, 已预读的文本块)，调用方需先写出预读的文本块再继续读取 texts。
+    """
+    buffered = []
+    size = 0
+    line = ''
+    for text in texts:
+        buffered.append(text)
+        size += len(text.encode('utf-8'))
+        *complete, line = (line + text).split('\n')
+        for candidate in complete:
+            description = _description_line(candidate)
+            if description:
+                return description, buffered
+        if size > max_bytes:
+            return None, buffered
+    return _description_line(line), buffered
+
+
+def write_skill_md_from_readme(f, repo_info, metadata, created_at):
+    """
+    基于 README 生成 SKILL.md 并写入 f：描述取自正文中第一行可用的文本（边读边找），
+    正文边读边写（删除 data: URI 图片），超过 README_MAX_BYTES 时截断并注明原文地址。
+    """
+    readme = repo_info.get('readme')
+    stripper = DataUriStripper()
+    
+    def stripped():
+        if readme:
+            yield stripper.feed(readme.head)
+            for text in readme.iter_rest():
+                yield stripper.feed(text)
+        yield stripper.flush()
+    
+    # README 开头可能是很大的内联图片，描述不能只看第一个 chunk：
+    # 预读（已删除 data: URI 的）文本到找到描述为止，预读的内容随后照常写入正文
+    texts = stripped()
+    description, buffered = read_description(texts, max(README_MAX_BYTES, README_CHUNK_SIZE))
+    metadata['description'] = description or f"Skill wrapper for {repo_info['name']}."
+    
+    # 构建 frontmatter
+    fm_str = yaml.dump(metadata, default_flow_style=False, allow_unicode=True)
+    f.write(f"---\n{fm_str}---\n\n# {repo_info['name']}\n\n")
+    
+    written, truncated = write_readme_body(f, itertools.chain(buffered, texts), README_MAX_BYTES)
+    if truncated:
+        f.write(f"\n> README truncated after {written} bytes, see the full document: {readme.url}\n")
+    
+    f.write(f"""
+
+## Usage
+
+[TODO: Add usage instructions based on the repository documentation]
+
+## Implementation Notes
+
+- Source: [{repo_info['url']}]({repo_info['url']})
+- Branch: {repo_info['branch']}
+- Last synced: {created_at}
+""")
+
+
+def _hash_blob_file(path):
+    """按 git blob 格式计算文件的 SHA"""
+    with open(path, "rb") as f:
+        digest = hashlib.sha1(f"blob {os.fstat(f.fileno()).st_size}\0".encode('ascii'))
+        for chunk in iter(lambda: f.read(README_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_archive_file(src, dest, mode, size):
+    """
+    把 archive 中的一个文件写到 dest（先写临时文件再替换），返回内容的 git blob SHA。
+    size 未知（None）时读到 EOF，写完后再对临时文件计算 SHA。
+    """
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    digest = hashlib.sha1(f"blob {size}\0".encode('ascii')) if size is not None else None
+    tmp_path = dest + ".tmp"
+    written = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in iter(lambda: src.read(README_CHUNK_SIZE), b''):
+                if digest is not None:
+                    digest.update(chunk)
+                f.write(chunk)
+                written += len(chunk)
+        if digest is None:
+            sha = _hash_blob_file(tmp_path)
+        else:
+            # 内容长度与 size 不符时 SHA 必然不对
+            sha = digest.hexdigest() if written == size else None
+        os.chmod(tmp_path, 0o755 if mode & 0o111 else 0o644)
+        os.replace(tmp_path, dest)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return sha
+
+
+def _subtree_path(path, subdir):
+    """仓库内路径 -> subdir 下的相对路径；不属于 subdir、SKILL.md 或越界路径返回 None"""
+    if subdir:
+        if not path.startswith(subdir + '/'):
+            return None
+        path = path[len(subdir) + 1:]
+    if not path or path == "SKILL.md" or path.startswith('/') or '..' in path.split('/'):
+        return None
+    return path
+
+
+def fetch_subtree_blobs(owner_repo, ref, subdir):
+    """
+    一次 Trees API 请求（recursive）读取 ref 处 subdir 下的文件，
+    返回 {相对路径: (blob SHA, mode, size)}；符号链接和子模块跳过。
+    请求失败或结果被截断时返回 None。
+    """
+    url = f"{API_BASE_URL}/repos/{owner_repo}/git/trees/{ref}?recursive=1"
+    headers = {'Accept': 'application/vnd.github+json'}
+    token = os.getenv('GITHUB_TOKEN')
+    if token:
+        headers['Authorization'] = f'token {token}'
+    try:
+        with _pool.open(url, timeout=ARCHIVE_TIMEOUT, headers=headers) as response:
+            body = response.read()
+            if response.status != 200:
+                return None
+        data = json.loads(body.decode('utf-8'))
+    except Exception:
+        return None
+    if data.get('truncated'):
+        return None
+    blobs = {}
+    for entry in data.get('tree', []):
+        if entry.get('type') != 'blob' or entry.get('mode') == '120000':
+            continue
+        path = _subtree_path(entry['path'], subdir)
+        if path:
+            blobs[path] = (entry['sha'], int(entry['mode'], 8), entry.get('size'))
+    return blobs
+
+
+def download_raw_file(owner_repo, ref, repo_path, dest, sha, mode, size):
+    """从 raw 地址下载 ref 处的原始文件（不经过 archive 的 export-subst），校验 blob SHA"""
+    url = f"{RAW_BASE_URL}/{owner_repo}/{ref}/{urllib.parse.quote(repo_path)}"
+    with _pool.open(url, timeout=ARCHIVE_TIMEOUT) as response:
+        if response.status != 200:
+            response.read()
+            raise Exception(f"Download failed: HTTP {response.status} ({url})")
+        if size is None and response.headers.get('Content-Length'):
+            size = int(response.headers['Content-Length'])
+        actual = _write_archive_file(response, dest, mode, size)
+    if actual != sha:
+        raise Exception(f"Blob hash mismatch for {repo_path}: expected {sha}, got {actual}")
+
+
+def download_subtree(repo_info, skill_path):
+    """
+    完整导入：一次流式下载仓库 archive（codeload tar.gz），只解出 subdir 下的文件写入 skill_path。
+    git archive 会按 .gitattributes 改写（export-subst）或排除（export-ignore）文件，
+    因此同时读取该 commit 的 tree，tracked_files 记录 tree 中的 blob SHA：
+    内容与 tree 不一致的文件和 archive 中缺少的文件从 raw 地址重新下载。
+    tree 读取失败时退回使用 archive 内容计算的 SHA。
+    SKILL.md 由 create_skill 生成，不从 archive 写入；符号链接、子模块和越界路径跳过。
+    返回按路径排序的 [{"path": 相对路径, "sha": blob SHA}]（不含 SKILL.md）
+    """
+    owner_repo = repo_info['repo_url'].split("github.com/", 1)[-1]
+    ref = repo_info['latest_hash'] if repo_info['latest_hash'] != "unknown" else repo_info['branch']
+    url = f"{CODELOAD_BASE_URL}/{owner_repo}/tar.gz/{ref}"
+    subdir = repo_info['subdir'].strip('/')
+    
+    # tree 请求与 archive 下载同时进行
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    tree_future = executor.submit(fetch_subtree_blobs, owner_repo, ref, subdir)
+    executor.shutdown(wait=False)
+    
+    extracted = {}
+    with _pool.open(url, timeout=ARCHIVE_TIMEOUT) as response:
+        if response.status != 200:
+            raise Exception(f"Archive download failed: HTTP {response.status} ({url})")
+        with tarfile.open(fileobj=response, mode='r|gz') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                # 去掉 archive 的顶层目录 <repo>-<sha>/
+                path = _subtree_path(member.name.partition('/')[2], subdir)
+                if not path:
+                    continue
+                dest = os.path.join(skill_path, *path.split('/'))
+                extracted[path] = _write_archive_file(archive.extractfile(member), dest, member.mode, member.size)
+    
+    blobs = tree_future.result()
+    if blobs is None:
+        print(f"Warning: 无法读取 {owner_repo}@{ref} 的 tree，tracked_files 使用 archive 内容的 hash", file=sys.stderr)
+    else:
+        refetch = [path for path, (sha, _, _) in blobs.items() if extracted.get(path) != sha]
+        if refetch:
+            log(f"{len(refetch)} 个文件与 tree 不一致（export-subst / export-ignore），从 raw 重新下载...")
+        for path in refetch:
+            sha, mode, size = blobs[path]
+            repo_path = f"{subdir}/{path}" if subdir else path
+            download_raw_file(owner_repo, ref, repo_path, os.path.join(skill_path, *path.split('/')), sha, mode, size)
+            extracted[path] = sha
+    return sorted(({"path": path, "sha": sha} for path, sha in extracted.items()), key=lambda item: item['path'])
+
+
+def create_skill(repo_info, output_dir, full_tree=False):
     """
     创建 skill 目录结构和文件
+    full_tree: 同时导入 subdir 下的全部文件，并在 frontmatter 中记录 tracked_files，
+               之后 skill-manager 只需对比这些文件的 hash，不必扫描目录
     """
-    # 规范化名称
-    safe_name = "".join(c if c.isalnum() or c in ('-', '_') else '-' for c in repo_info['name']).lower()
+    safe_name = skill_dir_name(repo_info['name'])
     skill_path = os.path.join(output_dir, safe_name)
     
     if os.path.exists(skill_path):
-        print(f"Warning: {skill_path} 已存在，将覆盖 SKILL.md")
+        log(f"Warning: {skill_path} 已存在，将覆盖 SKILL.md")
     
-    os.makedirs(os.path.join(skill_path, "scripts"), exist_ok=True)
+    # 完整导入时使用上游的目录结构，不创建占位 scripts/
+    os.makedirs(skill_path if full_tree else os.path.join(skill_path, "scripts"), exist_ok=True)
     # 仅在必要时创建 references
     # os.makedirs(os.path.join(skill_path, "references"), exist_ok=True) 
     
@@ -189,55 +809,45 @@ def create_skill(repo_info, output_dir):
     # 准备元数据
     metadata = {
         "name": safe_name,
-        "github_url": repo_info['url'],
+        "github_url": repo_info['github_url'],
         "github_hash": repo_info['latest_hash'],
         "version": "0.1.0",
         "created_at": created_at
     }
-
-    if repo_info.get('skill_md'):
-        # 策略 A: 远程已有 SKILL.md -> 智能合并
-        print("Using remote SKILL.md as base...")
-        final_skill_md = update_frontmatter(repo_info['skill_md'], metadata)
-        
-    else:
-        # 策略 B: 远程无 SKILL.md -> 基于 README 生成
-        print("Generating SKILL.md from README...")
-        
-        readme_lines = repo_info['readme'].split('\n')
-        description = f"Skill wrapper for {repo_info['name']}."
-        for line in readme_lines:
-            line = line.strip()
-            if line and not line.startswith('#') and not line.startswith('---'):
-                description = line[:200]
-                break
-        
-        metadata['description'] = description
-        
-        # 构建 frontmatter
-        fm_str = yaml.dump(metadata, default_flow_style=False, allow_unicode=True)
-        
-        final_skill_md = f"""---
-{fm_str}---
-
-# {repo_info['name']}
-
-{repo_info['readme']}
-
-## Usage
-
-[TODO: Add usage instructions based on the repository documentation]
-
-## Implementation Notes
-
-- Source: [{repo_info['url']}]({repo_info['url']})
-- Branch: {repo_info['branch']}
-- Last synced: {created_at}
-"""
     
+    if full_tree:
+        log("Downloading repository files...")
+        start = time.monotonic()
+        try:
+            tracked = download_subtree(repo_info, skill_path)
+        except Exception:
+            close_repo_info(repo_info)
+            raise
+        metadata['tracked_files'] = tracked
+        repo_info['tracked_files'] = tracked
+        repo_info.setdefault('timings', {})['archive'] = round(time.monotonic() - start, 3)
+
     skill_md_path = os.path.join(skill_path, "SKILL.md")
-    with open(skill_md_path, "w", encoding="utf-8") as f:
-        f.write(final_skill_md)
+    tmp_path = skill_md_path + ".tmp"
+    
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            if repo_info.get('skill_md'):
+                # 策略 A: 远程已有 SKILL.md -> 智能合并
+                log("Using remote SKILL.md as base...")
+                f.write(update_frontmatter(repo_info['skill_md'], metadata))
+            else:
+                # 策略 B: 远程无 SKILL.md -> 基于 README 生成
+                log("Generating SKILL.md from README...")
+                write_skill_md_from_readme(f, repo_info, metadata, created_at)
+        os.replace(tmp_path, skill_md_path)
+    finally:
+        close_repo_info(repo_info)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    
+    if full_tree:
+        return skill_path
     
     # 创建占位 wrapper 脚本 (如果远程没有 scripts 目录结构，或者我们还没 sync)
     wrapper_path = os.path.join(skill_path, "scripts", "wrapper.py")
@@ -265,13 +875,120 @@ if __name__ == "__main__":
     return skill_path
 
 
+def read_batch_urls(source):
+    """读取批量模式的 URL 列表（- 表示 stdin），跳过空行和 # 注释，去重并保持顺序"""
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(os.path.expanduser(source), encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    urls = [line.strip() for line in lines]
+    return list(dict.fromkeys(u for u in urls if u and not u.startswith('#')))
+
+
+def import_repo(url, output_dir, claimed, claimed_lock, full_tree=False):
+    """
+    批量模式中导入单个仓库，返回该仓库的结果记录（异常也记录在结果中）。
+    claimed: 本批次已占用的 skill 目录名 -> URL，避免两个仓库写入同一个目录
+    """
+    start = time.monotonic()
+    record = {"type": "repo", "url": url}
+    repo_info = None
+    try:
+        repo_info = get_repo_info(url)
+        safe_name = skill_dir_name(repo_info['name'])
+        with claimed_lock:
+            owner = claimed.setdefault(safe_name, url)
+        if owner != url:
+            raise Exception(f"Skill name '{safe_name}' already used by {owner} in this batch")
+        skill_path = create_skill(repo_info, output_dir, full_tree=full_tree)
+        record.update({
+            "success": True,
+            "skill_path": skill_path,
+            "name": repo_info['name'],
+            "branch": repo_info['branch'],
+            "hash": repo_info['latest_hash'],
+            "timings": repo_info['timings'],
+        })
+        if full_tree:
+            record["tracked_files"] = len(repo_info['tracked_files'])
+    except Exception as e:
+        record.update({"success": False, "error": str(e)})
+    finally:
+        if repo_info:
+            close_repo_info(repo_info)
+    record["elapsed"] = round(time.monotonic() - start, 3)
+    return record
+
+
+def run_batch(urls, output_dir, concurrency=DEFAULT_BATCH_CONCURRENCY, out=None, full_tree=False):
+    """
+    并发导入所有 URL，每个仓库完成时立即向 out 写一行 JSON，最后写一行 summary。
+    所有仓库共用同一个连接池；总耗时取决于最慢的仓库而不是耗时之和（concurrency 足够时）。
+    """
+    out = out or sys.stdout
+    start = time.monotonic()
+    claimed = {}
+    claimed_lock = threading.Lock()
+    succeeded = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = [executor.submit(import_repo, url, output_dir, claimed, claimed_lock, full_tree)
+                   for url in urls]
+        for future in concurrent.futures.as_completed(futures):
+            record = future.result()
+            if record['success']:
+                succeeded += 1
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+    summary = {
+        "type": "summary",
+        "total": len(urls),
+        "succeeded": succeeded,
+        "failed": len(urls) - succeeded,
+        "elapsed": round(time.monotonic() - start, 3),
+        "connections": dict(_pool.stats),
+    }
+    out.write(json.dumps(summary) + "\n")
+    out.flush()
+    return succeeded == len(urls)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="一键将 GitHub 仓库转换为 OpenCode Skill")
+    parser.add_argument("targets", nargs="*", help="<github_url> [output_dir]；批量模式下为 [output_dir]")
+    parser.add_argument("--batch", metavar="FILE", help="批量导入的 URL 列表文件，- 表示 stdin")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_BATCH_CONCURRENCY,
+                        help="批量模式同时处理的仓库数")
+    parser.add_argument("--readme-max-bytes", type=int, default=README_MAX_BYTES,
+                        help="生成 SKILL.md 时写入的 README 正文字节上限")
+    parser.add_argument("--full-tree", action="store_true",
+                        help="导入 subdir 下的全部文件，并在 frontmatter 中记录 tracked_files")
+    return parser.parse_args(argv)
+
+
 def main():
-    if len(sys.argv) < 2:
+    global LOG_STREAM, README_MAX_BYTES
+    args = parse_args(sys.argv[1:])
+    README_MAX_BYTES = args.readme_max_bytes
+    
+    if args.batch:
+        # 批量模式下唯一的位置参数是输出目录
+        if len(args.targets) > 1:
+            print(__doc__)
+            sys.exit(1)
+        output_dir = args.targets[0] if args.targets else DEFAULT_OUTPUT_DIR
+        os.makedirs(output_dir, exist_ok=True)
+        LOG_STREAM = sys.stderr
+        ok = run_batch(read_batch_urls(args.batch), output_dir, concurrency=args.concurrency,
+                       full_tree=args.full_tree)
+        sys.exit(0 if ok else 1)
+    
+    if not args.targets or len(args.targets) > 2:
         print(__doc__)
         sys.exit(1)
     
-    github_url = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_OUTPUT_DIR
+    github_url = args.targets[0]
+    output_dir = args.targets[1] if len(args.targets) > 1 else DEFAULT_OUTPUT_DIR
     
     # 确保输出目录存在
     os.makedirs(output_dir, exist_ok=True)
@@ -283,21 +1000,26 @@ def main():
     print(f"🔗 Hash: {repo_info['latest_hash'][:8]}...")
     
     print(f"🛠️  Creating skill...")
-    skill_path = create_skill(repo_info, output_dir)
+    skill_path = create_skill(repo_info, output_dir, full_tree=args.full_tree)
     
     print(f"\n✅ Skill created: {skill_path}")
     print(f"\nNext steps:")
     print(f"  1. Review and edit: {skill_path}/SKILL.md")
-    print(f"  2. Implement wrapper: {skill_path}/scripts/wrapper.py")
+    if not args.full_tree:
+        print(f"  2. Implement wrapper: {skill_path}/scripts/wrapper.py")
     
     # 输出 JSON 供 Agent 使用
-    print(f"\n--- JSON Output ---")
-    print(json.dumps({
+    result = {
         "skill_path": skill_path,
         "name": repo_info['name'],
         "hash": repo_info['latest_hash'],
+        "timings": repo_info['timings'],
         "success": True
-    }, indent=2))
+    }
+    if args.full_tree:
+        result["tracked_files"] = len(repo_info['tracked_files'])
+    print(f"\n--- JSON Output ---")
+    print(json.dumps(result, indent=2))
 
 
 if __name__ == "__main__":
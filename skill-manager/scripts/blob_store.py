@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+blob_store.py - skills 共享的内容寻址 blob 存储
+
+Usage:
+    python blob_store.py gc [skills_dir] [--grace SECONDS]
+
+按 Git blob SHA 把下载过的文件保存在 <skills_dir>/.skill-manager/blobs/ab/cdef... 下，
+同一份内容只下载、只存储一次，再按 SKILL_MANAGER_LINK_MODE 物化到各个 skill 目录：
+    reflink  (默认) 使用 reflink (FICLONE)。文件系统不支持 reflink 时（例如 ext4）自动改用硬链接；
+             两者都不支持时只能复制，存储里的每个 blob 都会多占一份空间，因此不再写入存储
+             （文件直接下载到 skill 目录）
+    hardlink 尝试硬链接，失败时复制。注意硬链接共享 inode，原地修改一个 skill 的文件会影响其他 skill
+             （编辑器保存时通常写新文件再替换，不受影响）；被改动的 blob 在下次使用前会被发现并丢弃
+    copy     总是复制
+SKILL.md 总是复制，因为它会被原地改写。
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import threading
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from skill_index import get_state_dir, get_skill_index
+from scan_and_check import get_default_skills_dir, get_local_file_hash
+
+LINK_MODE = os.getenv("SKILL_MANAGER_LINK_MODE", "reflink")
+# gc 不删除最近这么多秒内写入的 blob，避免和正在进行的更新冲突
+GC_GRACE_SECONDS = 3600
+# Linux FICLONE ioctl
+FICLONE = 0x40049409
+
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _reflink(src, dst):
+    """尝试以 reflink 方式复制文件，不支持时抛出 OSError"""
+    import fcntl
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+
+class BlobStore:
+    """内容寻址存储，key 为 Git blob SHA"""
+
+    def __init__(self, skills_root, link_mode=LINK_MODE):
+        self.skills_root = os.path.abspath(skills_root)
+        self.root = os.path.join(get_state_dir(self.skills_root), "blobs")
+        self.link_mode = link_mode
+        self._index = get_skill_index(self.skills_root)
+        self._lock = threading.Lock()
+        # 本进程中已校验过（或刚写入并校验过）的 blob，has() 不再重复读取
+        self._verified = set()
+        self._mode = None
+
+    def path_for(self, sha):
+        return os.path.join(self.root, sha[:2], sha[2:])
+
+    @property
+    def mode(self):
+        """
+        实际使用的物化方式。reflink 模式第一次使用时探测文件系统：
+        不支持 reflink 时改用 hardlink，硬链接也不支持时只能 copy。
+        """
+        with self._lock:
+            if self._mode is None:
+                self._mode = self.link_mode
+                if self.link_mode == 'reflink' and not self._probe(_reflink):
+                    self._mode = 'hardlink' if self._probe(os.link) else 'copy'
+                    print(f"Note: reflink is not supported under {self.skills_root}, "
+                          f"sharing blobs with {self._mode}s", file=sys.stderr)
+            return self._mode
+
+    @property
+    def populate(self):
+        """
+        是否把新 blob 写入存储。reflink 模式下文件系统既不支持 reflink 也不支持硬链接时，
+        物化只能复制，存储里的副本纯属浪费，因此不写入。
+        """
+        return not (self.link_mode == 'reflink' and self.mode == 'copy')
+
+    def _probe(self, place):
+        """在存储目录里试一次 place(src, dst)（reflink 或硬链接），返回是否成功"""
+        probe = os.path.join(self.root, f".probe-{os.getpid()}-{threading.get_ident()}")
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            with open(probe, 'wb') as f:
+                f.write(b'probe')
+            place(probe, probe + '-clone')
+            return True
+        except (OSError, ImportError):
+            return False
+        finally:
+            for path in (probe, probe + '-clone'):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def remember(self, sha):
+        """记录刚写入存储且已校验过 SHA 的 blob"""
+        with self._lock:
+            self._verified.add(sha)
+
+    def has(self, sha):
+        """
+        存储中有该 blob 且内容未被改动（通过 hash 缓存校验，未变化的文件不会重读）。
+        本进程中校验过的 blob 只检查文件是否还在。
+        """
+        path = self.path_for(sha)
+        if not os.path.exists(path):
+            with self._lock:
+                self._verified.discard(sha)
+            return False
+        with self._lock:
+            if sha in self._verified:
+                return True
+        if get_local_file_hash(path, self._index) == sha:
+            self.remember(sha)
+            return True
+        # 内容被改动（例如通过硬链接被原地编辑），丢弃
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return False
+
+    def prepare(self, sha):
+        """返回写入该 blob 的目标路径（调用方写完后需自行校验 hash）"""
+        path = self.path_for(sha)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def add_file(self, src_path, sha):
+        """把已校验过的本地文件收入存储（存储不写入时什么都不做）"""
+        if not self.populate or self.has(sha):
+            return
+        path = self.prepare(sha)
+        # 以 . 开头的临时文件不会被当作 blob
+        tmp_path = os.path.join(os.path.dirname(path), f".add-{os.getpid()}-{threading.get_ident()}")
+        try:
+            self._place(src_path, tmp_path)
+            os.replace(tmp_path, path)
+            self.remember(sha)
+        except OSError as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            print(f"Warning: failed to add blob {sha} to store: {e}", file=sys.stderr)
+
+    def materialize(self, sha, dest_path, src_path=None):
+        """
+        把 blob 放到 dest_path（原子替换），返回使用的方式: reflink / hardlink / copy。
+        src_path 指定时从该文件（内容已校验为 sha）物化，用于存储不写入的情况。
+        """
+        src_path = src_path or self.path_for(sha)
+        dest_dir = os.path.dirname(dest_path)
+        os.makedirs(dest_dir, exist_ok=True)
+        tmp_path = os.path.join(
+            dest_dir, f".materialize-{os.getpid()}-{threading.get_ident()}-{os.path.basename(dest_path)}"
+        )
+        try:
+            old_mode = os.stat(dest_path).st_mode & 0o7777
+        except OSError:
+            old_mode = None
+
+        # 硬链接与存储共享权限位，已有文件的权限不同时（例如可执行脚本）改为复制
+        allow_hardlink = os.path.basename(dest_path) != 'SKILL.md'
+        if old_mode is not None and allow_hardlink and self.mode == 'hardlink':
+            allow_hardlink = (os.stat(src_path).st_mode & 0o7777) == old_mode
+
+        try:
+            method = self._place(src_path, tmp_path, allow_hardlink=allow_hardlink)
+            if method != 'hardlink':
+                os.chmod(tmp_path, old_mode if old_mode is not None else 0o666 & ~_UMASK)
+            os.replace(tmp_path, dest_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return method
+
+    def _place(self, src, dst, allow_hardlink=True):
+        mode = self.mode
+        if mode == 'hardlink' and allow_hardlink:
+            try:
+                os.link(src, dst)
+                return 'hardlink'
+            except OSError:
+                pass
+        if mode in ('reflink', 'hardlink'):
+            try:
+                _reflink(src, dst)
+                return 'reflink'
+            except (OSError, ImportError):
+                if os.path.exists(dst):
+                    os.remove(dst)
+        shutil.copyfile(src, dst)
+        return 'copy'
+
+    def iter_blobs(self):
+        if not os.path.isdir(self.root):
+            return
+        for prefix in os.listdir(self.root):
+            prefix_dir = os.path.join(self.root, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for rest in os.listdir(prefix_dir):
+                if rest.startswith('.'):
+                    continue
+                yield prefix + rest, os.path.join(prefix_dir, rest)
+
+    def referenced_hashes(self):
+        """所有 skill 目录中文件的 blob hash（借助 hash 缓存，未变化的文件不重读）"""
+        referenced = set()
+        for item in os.listdir(self.skills_root):
+            skill_dir = os.path.join(self.skills_root, item)
+            if item.startswith('.') or not os.path.isdir(skill_dir):
+                continue
+            for root, dirs, files in os.walk(skill_dir):
+                for file in files:
+                    digest = get_local_file_hash(os.path.join(root, file), self._index)
+                    if digest:
+                        referenced.add(digest)
+        self._index.flush()
+        return referenced
+
+    def gc(self, grace=GC_GRACE_SECONDS):
+        """删除没有任何 skill 引用的 blob，返回统计信息"""
+        referenced = self.referenced_hashes()
+        now = time.time()
+        removed = kept = freed = 0
+        for sha, path in list(self.iter_blobs()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            # 硬链接数 > 1 说明仍有 skill 文件指向它
+            if sha in referenced or st.st_nlink > 1 or now - st.st_mtime < grace:
+                kept += 1
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+                freed += st.st_size
+            except OSError:
+                kept += 1
+        return {"removed": removed, "kept": kept, "bytes_freed": freed}
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_blob_store(skills_root):
+    """按 skills 根目录复用同一个 BlobStore 实例"""
+    key = os.path.abspath(skills_root)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = BlobStore(key)
+            _stores[key] = store
+        return store
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] != 'gc':
+        print(__doc__)
+        sys.exit(1)
+
+    skills_root = get_default_skills_dir()
+    grace = GC_GRACE_SECONDS
+    rest = iter(args[1:])
+    for arg in rest:
+        if arg == '--grace':
+            grace = float(next(rest, GC_GRACE_SECONDS))
+        elif not arg.startswith('-'):
+            skills_root = arg
+
+    if not os.path.isdir(skills_root):
+        print(json.dumps({"error": f"Skills directory not found: {skills_root}"}))
+        sys.exit(1)
+
+    print(json.dumps(get_blob_store(skills_root).gc(grace=grace), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+git_backend.py - 基于 git 部分克隆的远程数据后端
+
+REST 后端每次检查都要请求 Trees API，每个文件一个 blob 请求，且都受 API 配额限制。
+git 后端为每个上游仓库在用户缓存目录维护一个 bare + blobless（--filter=blob:none）的浅克隆：
+- HEAD：git ls-remote，不消耗 API 配额
+- tree：按 commit 抓取（只有 commit 和 tree 对象），再用 git ls-tree 读取；同一 commit 只抓取一次
+- blob：只抓取需要的 blob（一次 fetch 批量获取），用 git cat-file 流式读出
+
+仓库地址: SKILL_MANAGER_GIT_URL/<owner>/<repo>，默认 https://github.com；
+测试时可指向本地目录，例如 file:///tmp/upstream。
+缓存目录: <SKILL_MANAGER_CACHE_DIR>/git/<owner>/<repo>.git
+"""
+
+import os
+import re
+import sys
+import base64
+import threading
+import subprocess
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from http_cache import get_user_cache_dir
+from remote_tree import RemoteTree
+
+GIT_URL_BASE = os.getenv("SKILL_MANAGER_GIT_URL", "https://github.com").rstrip('/')
+GIT_TIMEOUT = 300
+# 单次 fetch 命令最多请求的 blob 数
+FETCH_BATCH_SIZE = 1000
+BLOB_CHUNK_SIZE = 64 * 1024
+
+_SHA_RE = re.compile(r'^[0-9a-f]{40}$')
+
+# 本地仓库的 upload-pack 默认不支持 filter 和按 SHA 抓取（GitHub 都支持）
+_LOCAL_UPLOAD_PACK = "git -c uploadpack.allowFilter=true -c uploadpack.allowAnySHA1InWant=true upload-pack"
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class GitBackendError(Exception):
+    """git 命令执行失败"""
+
+
+class _RepoLock:
+    """同一仓库缓存的进程内 + 跨进程互斥（fcntl 不可用时只有进程内）"""
+
+    def __init__(self, thread_lock, lock_path):
+        self._thread_lock = thread_lock
+        self._lock_path = lock_path
+        self._fd = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            self._fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._thread_lock.release()
+
+
+class GitBackend:
+    """每个上游仓库一个 blobless 部分克隆"""
+
+    name = 'git'
+
+    def __init__(self, cache_dir=None, url_base=GIT_URL_BASE):
+        self.cache_dir = cache_dir or os.path.join(get_user_cache_dir(), "git")
+        self.url_base = url_base
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        # 本进程内已确认 remote 地址的仓库
+        self._checked = set()
+
+    def remote_url(self, owner, repo):
+        return f"{self.url_base}/{owner}/{repo}"
+
+    def repo_dir(self, owner, repo):
+        return os.path.join(self.cache_dir, owner, repo + ".git")
+
+    def _lock(self, owner, repo):
+        key = (owner, repo)
+        with self._locks_lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                self._locks[key] = lock
+        os.makedirs(os.path.join(self.cache_dir, owner), exist_ok=True)
+        return _RepoLock(lock, self.repo_dir(owner, repo) + ".lock")
+
+    def _env(self):
+        env = dict(os.environ)
+        env['GIT_TERMINAL_PROMPT'] = '0'
+        token = os.getenv('GITHUB_TOKEN')
+        if token and self.url_base.startswith('https://'):
+            # 通过环境变量传配置，token 不会出现在进程参数里
+            basic = base64.b64encode(f"x-access-token:{token}".encode('utf-8')).decode('ascii')
+            count = int(env.get('GIT_CONFIG_COUNT', '0'))
+            env[f'GIT_CONFIG_KEY_{count}'] = 'http.extraHeader'
+            env[f'GIT_CONFIG_VALUE_{count}'] = f'Authorization: Basic {basic}'
+            env['GIT_CONFIG_COUNT'] = str(count + 1)
+        return env
+
+    def _git(self, git_dir, *args, input=None, check=True):
+        cmd = ['git']
+        if git_dir:
+            cmd += ['--git-dir', git_dir]
+        cmd += list(args)
+        result = subprocess.run(
+            cmd, input=input, capture_output=True, timeout=GIT_TIMEOUT,
+            env=self._env()
+        )
+        if check and result.returncode != 0:
+            message = result.stderr.decode('utf-8', 'replace').strip()
+            raise GitBackendError(f"git {args[0]} failed: {message}")
+        return result
+
+    def _ensure(self, owner, repo):
+        """初始化 bare 部分克隆（调用方需持有仓库锁）"""
+        path = self.repo_dir(owner, repo)
+        url = self.remote_url(owner, repo)
+        if os.path.exists(os.path.join(path, "HEAD")):
+            if (owner, repo) not in self._checked:
+                # SKILL_MANAGER_GIT_URL 可能改过，缓存的克隆要跟着换 remote
+                current = self._git(path, 'config', 'remote.origin.url', check=False).stdout.decode('utf-8').strip()
+                if current != url:
+                    self._configure(path, url)
+                self._checked.add((owner, repo))
+            return path
+        self._git(None, 'init', '--bare', '--quiet', path)
+        self._configure(path, url)
+        self._checked.add((owner, repo))
+        return path
+
+    def _configure(self, path, url):
+        """部分克隆所需的配置"""
+        for key, value in (
+            ('remote.origin.url', url),
+            ('remote.origin.promisor', 'true'),
+            ('remote.origin.partialclonefilter', 'blob:none'),
+            ('extensions.partialClone', 'origin'),
+            ('core.repositoryFormatVersion', '1'),
+            ('gc.auto', '0'),
+        ):
+            self._git(path, 'config', key, value)
+        if '://' not in self.url_base or self.url_base.startswith('file://'):
+            self._git(path, 'config', 'remote.origin.uploadpack', _LOCAL_UPLOAD_PACK)
+        else:
+            self._git(path, 'config', '--unset', 'remote.origin.uploadpack', check=False)
+
+    # 部分克隆中 cat-file -e 之类的对象查询遇到缺失对象会自动逐个抓取，
+    # 所以下面两个检查都不读取对象本身
+
+    def _has_commit(self, path, sha):
+        """fetch_tree 抓取过的 commit 都记录为 refs/commits/<sha>"""
+        return self._git(path, 'show-ref', '--verify', '--quiet', f'refs/commits/{sha}', check=False).returncode == 0
+
+    def _local_objects(self, path):
+        out = self._git(path, 'cat-file', '--batch-check=%(objectname)', '--batch-all-objects', '--unordered').stdout
+        return set(out.decode('ascii').split())
+
+    def resolve_head(self, owner, repo, branch):
+        """分支 HEAD 的 commit SHA，不存在时返回 None"""
+        result = self._git(None, 'ls-remote', self.remote_url(owner, repo), f'refs/heads/{branch}', check=False)
+        if result.returncode != 0:
+            return None
+        out = result.stdout.decode('utf-8', 'replace').split()
+        return out[0] if out else None
+
+    def fetch_tree(self, owner, repo, ref):
+        """
+        返回 ref（分支名或 commit SHA）处的 RemoteTree {path: blob_sha}。
+        已经抓取过的 commit 直接从本地读取，不访问网络。
+        """
+        with self._lock(owner, repo):
+            path = self._ensure(owner, repo)
+            if _SHA_RE.match(ref) and self._has_commit(path, ref):
+                commit = ref
+            else:
+                try:
+                    self._git(path, 'fetch', '--quiet', '--no-tags', '--depth=1', '--filter=blob:none', 'origin', ref)
+                except GitBackendError as e:
+                    raise Exception(f"Repository or branch not found: {owner}/{repo}@{ref} ({e})")
+                commit = self._git(path, 'rev-parse', 'FETCH_HEAD').stdout.decode('ascii').strip()
+                self._git(path, 'update-ref', f'refs/commits/{commit}', commit)
+
+            out = self._git(path, 'ls-tree', '-r', '-z', '--full-tree', commit).stdout
+        tree_map = {}
+        for record in out.split(b'\0'):
+            if not record:
+                continue
+            meta, _, file_path = record.partition(b'\t')
+            mode, obj_type, sha = meta.split(b' ')
+            if obj_type == b'blob':
+                tree_map[file_path.decode('utf-8', 'surrogateescape')] = sha.decode('ascii')
+        return RemoteTree(tree_map)
+
+    def prefetch_blobs(self, owner, repo, shas):
+        """一次 fetch 批量抓取缺失的 blob，避免 cat-file 逐个按需抓取"""
+        with self._lock(owner, repo):
+            path = self._ensure(owner, repo)
+            present = self._local_objects(path)
+            missing = [sha for sha in dict.fromkeys(shas) if sha not in present]
+            for i in range(0, len(missing), FETCH_BATCH_SIZE):
+                batch = missing[i:i + FETCH_BATCH_SIZE]
+                self._git(path, '-c', 'fetch.negotiationAlgorithm=noop', 'fetch', '--quiet', '--no-tags',
+                          '--no-write-fetch-head', '--filter=blob:none', '--stdin', 'origin',
+                          input='\n'.join(batch).encode('ascii'))
+            return len(missing)
+
+    def blob_size(self, owner, repo, sha):
+        """blob 的字节数（缺失时按需抓取），用于边写边校验 blob SHA"""
+        out = self._git(self.repo_dir(owner, repo), 'cat-file', '-s', sha).stdout
+        return int(out.decode('ascii').strip())
+
+    def iter_blob(self, owner, repo, sha, chunk_size=BLOB_CHUNK_SIZE):
+        """流式读出 blob 内容；blob 不存在时抛出 GitBackendError"""
+        path = self.repo_dir(owner, repo)
+        proc = subprocess.Popen(
+            ['git', '--git-dir', path, 'cat-file', 'blob', sha],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=self._env()
+        )
+        try:
+            for chunk in iter(lambda: proc.stdout.read(chunk_size), b''):
+                yield chunk
+            stderr = proc.stderr.read()
+            if proc.wait() != 0:
+                raise GitBackendError(f"git cat-file {sha} failed: {stderr.decode('utf-8', 'replace').strip()}")
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            proc.stdout.close()
+            proc.stderr.close()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_git_backend():
+    """返回进程内共享的 GitBackend"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = GitBackend()
+        return _backend
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+http_cache.py - GitHub API 条件请求缓存
+
+按 API URL 保存响应的 ETag / Last-Modified 以及解析后的数据。
+下次请求时带上 If-None-Match / If-Modified-Since，
+服务端返回 304 时直接复用缓存数据（GitHub 对 304 不扣除 rate limit 配额）。
+
+缓存目录: SKILL_MANAGER_CACHE_DIR 环境变量，默认 ~/.cache/skill-manager
+"""
+
+import os
+import sys
+import json
+import hashlib
+import tempfile
+
+
+def get_user_cache_dir():
+    """skill-manager 的用户级缓存目录（跨 skills 目录、跨进程共享）"""
+    env_path = os.getenv("SKILL_MANAGER_CACHE_DIR")
+    if env_path:
+        return os.path.expanduser(env_path)
+    xdg = os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(xdg, "skill-manager")
+
+
+class HttpCache:
+    """以 URL 为 key 的条件请求缓存，每个条目一个 JSON 文件"""
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or os.path.join(get_user_cache_dir(), "http")
+
+    def _entry_path(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, url):
+        """返回 {'etag', 'last_modified', 'data'}，没有缓存时返回 None"""
+        try:
+            with open(self._entry_path(url), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('url') != url:
+            return None
+        return entry
+
+    def conditional_headers(self, entry):
+        """根据缓存条目生成条件请求头"""
+        headers = {}
+        if not entry:
+            return headers
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, url, etag, last_modified, data):
+        """保存响应，没有任何校验头时不缓存"""
+        if not etag and not last_modified:
+            return
+        entry = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'data': data
+        }
+        path = self._entry_path(url)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再 rename，避免并发进程读到半个文件
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: failed to write HTTP cache: {e}", file=sys.stderr)
+
+
+_default_cache = None
+
+
+def get_http_cache():
+    """返回进程内共享的 HttpCache"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = HttpCache()
+    return _default_cache
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+http_client.py - 带连接池的 HTTP 客户端（keep-alive）
+
+urllib.request.urlopen 每次调用都会新建 TCP+TLS 连接。
+这里按 (scheme, host, port) 复用 http.client 连接，并限制每个 host 的并发连接数。
+接口与 urllib 的行为保持一致：非 2xx 响应（包括 304）抛出 HTTPError，自动跟随重定向。
+
+get_stats() 返回新建连接数与复用连接数，用于确认 keep-alive 的效果。
+"""
+
+import json
+import socket
+import threading
+import http.client
+import urllib.parse
+
+DEFAULT_TIMEOUT = 20
+DEFAULT_MAX_PER_HOST = 8
+MAX_REDIRECTS = 5
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+# 复用的空闲连接被服务端关闭时会抛出这些异常，换新连接重试一次即可
+_STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+class HTTPError(Exception):
+    """非 2xx 响应，字段与 urllib.error.HTTPError 对齐"""
+
+    def __init__(self, url, code, headers, body=b''):
+        super().__init__(f"HTTP Error {code}: {url}")
+        self.url = url
+        self.code = code
+        self.headers = headers
+        self.body = body
+
+
+class Response:
+    """
+    HTTP 响应。非流式请求的 body 已读完；
+    流式请求需要用 read()/iter_content() 读取，读完或 close() 后连接归还连接池。
+    """
+
+    def __init__(self, pool, host_key, conn, raw, url, body=None):
+        self._pool = pool
+        self._host_key = host_key
+        self._conn = conn
+        self._raw = raw
+        self.url = url
+        self.status = raw.status
+        self.headers = raw.headers
+        self._body = body
+
+    def read(self, amt=None):
+        if self._body is not None:
+            if amt is None:
+                body, self._body = self._body, b''
+                return body
+            chunk, self._body = self._body[:amt], self._body[amt:]
+            return chunk
+        try:
+            data = self._raw.read() if amt is None else self._raw.read(amt)
+        except Exception:
+            self._release(reusable=False)
+            raise
+        if amt is None or not data:
+            self._release()
+        return data
+
+    def iter_content(self, chunk_size=64 * 1024):
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def json(self):
+        return json.loads(self.read().decode('utf-8'))
+
+    def close(self):
+        if self._conn is not None:
+            # 没读完的流式响应无法复用连接
+            self._release(reusable=self._raw.isclosed())
+
+    def _release(self, reusable=True):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        self._pool._put_conn(self._host_key, conn, reusable and not self._raw.will_close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _HostSlots:
+    """
+    每个 host 的并发连接数上限。与 BoundedSemaphore 不同，上限可以随时调整：
+    调整前借出的连接照常归还，超出新上限的部分在归还后才会再借出。
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_use = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_use >= self.limit:
+                self._cond.wait()
+            self.in_use += 1
+
+    def release(self):
+        with self._cond:
+            if self.in_use <= 0:
+                raise ValueError("Connection slot released too many times")
+            self.in_use -= 1
+            self._cond.notify()
+
+    def resize(self, limit):
+        with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+
+
+class ConnectionPool:
+    """按 host 复用连接的线程安全连接池"""
+
+    def __init__(self, max_per_host=DEFAULT_MAX_PER_HOST, timeout=DEFAULT_TIMEOUT, host_limits=None):
+        self.max_per_host = max_per_host
+        # 按 hostname 单独指定连接数上限，例如 {'codeload.github.com': 4}
+        self.host_limits = dict(host_limits or {})
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._slots = {}
+        self._stats = {'requests': 0, 'opened': 0, 'reused': 0}
+
+    def _slot(self, host_key):
+        with self._lock:
+            slot = self._slots.get(host_key)
+            if slot is None:
+                slot = _HostSlots(self._limit_for(host_key))
+                self._slots[host_key] = slot
+            return slot
+
+    def _limit_for(self, host_key):
+        return self.host_limits.get(host_key[1], self.max_per_host)
+
+    def _count(self, reused):
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['reused' if reused else 'opened'] += 1
+
+    def get_stats(self):
+        """返回 {'requests', 'opened', 'reused'} 计数"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _get_conn(self, host_key, timeout):
+        with self._lock:
+            idle = self._idle.get(host_key)
+            if idle:
+                conn = idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+
+        scheme, host, port = host_key
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        return conn, False
+
+    def _put_conn(self, host_key, conn, reusable):
+        if reusable:
+            with self._lock:
+                self._idle.setdefault(host_key, []).append(conn)
+        else:
+            conn.close()
+        self._slot(host_key).release()
+
+    def close(self):
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle = {}
+
+    def request(self, method, url, headers=None, body=None, timeout=None, stream=False):
+        """
+        发送请求并返回 Response，自动跟随重定向。
+        stream=True 时不预读 body，调用方负责读取或 close()。
+        """
+        headers = dict(headers or {})
+        timeout = timeout or self.timeout
+
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self._send(method, url, headers, body, timeout, stream)
+            if response.status not in REDIRECT_CODES:
+                break
+
+            location = response.headers.get('Location')
+            response.read()
+            response.close()
+            if not location:
+                raise HTTPError(url, response.status, response.headers)
+
+            new_url = urllib.parse.urljoin(url, location)
+            if urllib.parse.urlsplit(new_url).netloc != urllib.parse.urlsplit(url).netloc:
+                # 跨 host 重定向（例如 codeload）不能带上 token
+                headers.pop('Authorization', None)
+            if response.status == 303:
+                method, body = 'GET', None
+            url = new_url
+        else:
+            raise HTTPError(url, response.status, response.headers)
+
+        if response.status >= 300:
+            error_body = response.read()
+            response.close()
+            raise HTTPError(url, response.status, response.headers, error_body)
+        return response
+
+    def _send(self, method, url, headers, body, timeout, stream):
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme or 'https'
+        port = parts.port or (443 if scheme == 'https' else 80)
+        host_key = (scheme, parts.hostname, port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        slot = self._slot(host_key)
+        slot.acquire()
+        try:
+            conn, raw = self._exchange(host_key, method, path, headers, body, timeout)
+        except BaseException:
+            slot.release()
+            raise
+
+        response = Response(self, host_key, conn, raw, url)
+        if not stream:
+            try:
+                response._body = raw.read()
+            except BaseException:
+                response._release(reusable=False)
+                raise
+            response._release()
+        return response
+
+    def _exchange(self, host_key, method, path, headers, body, timeout):
+        for attempt in range(2):
+            conn, reused = self._get_conn(host_key, timeout)
+            self._count(reused)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                return conn, conn.getresponse()
+            except _STALE_ERRORS:
+                conn.close()
+                if not reused or attempt:
+                    raise
+            except (OSError, socket.timeout, http.client.HTTPException):
+                conn.close()
+                raise
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """返回进程内共享的连接池"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ConnectionPool()
+        return _default_pool
+
+
+def configure_pool(max_per_host=None, timeout=None, host_limits=None):
+    """
+    调整共享连接池的每 host 连接数上限和默认超时。
+    已有 host 的上限原地调整，正在使用的连接（例如超时后仍在运行的线程）照常归还。
+    """
+    pool = get_pool()
+    with pool._lock:
+        if max_per_host:
+            pool.max_per_host = max_per_host
+        if host_limits:
+            pool.host_limits.update(host_limits)
+        if timeout:
+            pool.timeout = timeout
+        for host_key, slot in pool._slots.items():
+            slot.resize(pool._limit_for(host_key))
+    return pool
+
+
+def get_stats():
+    """共享连接池的连接计数"""
+    return get_pool().get_stats()
+
+
+def request(method, url, headers=None, body=None, timeout=None, stream=False):
+    """使用共享连接池发送请求"""
+    return get_pool().request(method, url, headers=headers, body=body, timeout=timeout, stream=stream)
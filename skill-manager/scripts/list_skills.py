@@ -10,11 +10,11 @@ Usage:
 
 import os
 import sys
-import yaml
 import json
 
 # Ensure we can import from the same directory
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from skill_index import get_skill_index
 try:
     from scan_and_check import get_default_skills_dir
     DEFAULT_SKILLS_DIR = get_default_skills_dir()
@@ -24,7 +24,7 @@ except ImportError:
 
 
 def list_skills(skills_root, output_json=False):
-    """列出所有 skills 及其元数据。"""
+    """列出所有 skills 及其元数据（frontmatter 读自 skill_index 索引）。"""
     if not os.path.exists(skills_root):
         if output_json:
             print(json.dumps({"error": f"Directory not found: {skills_root}", "skills": []}))
@@ -34,34 +34,24 @@ def list_skills(skills_root, output_json=False):
 
     skills = []
     
-    for item in sorted(os.listdir(skills_root)):
+    for item, skill_dir, meta in get_skill_index(skills_root).refresh():
         # 跳过隐藏目录和特殊文件
         if item.startswith('.'):
             continue
-        skill_dir = os.path.join(skills_root, item)
-        if not os.path.isdir(skill_dir):
-            continue
             
-        skill_md = os.path.join(skill_dir, "SKILL.md")
         skill_type = "Standard"
         version = "0.1.0"
         description = "No description"
         github_url = None
         
-        if os.path.exists(skill_md):
+        if meta:
             try:
-                with open(skill_md, "r", encoding="utf-8") as f:
-                    content = f.read()
-                parts = content.split("---")
-                if len(parts) >= 3:
-                    meta = yaml.safe_load(parts[1])
-                    if meta:
-                        if "github_url" in meta:
-                            skill_type = "GitHub"
-                            github_url = meta.get("github_url")
-                        version = str(meta.get("version", "0.1.0"))
-                        desc = meta.get("description", "No description")
-                        description = desc.replace('\n', ' ') if desc else "No description"
+                if "github_url" in meta:
+                    skill_type = "GitHub"
+                    github_url = meta.get("github_url")
+                version = str(meta.get("version", "0.1.0"))
+                desc = meta.get("description", "No description")
+                description = desc.replace('\n', ' ') if desc else "No description"
             except Exception:
                 pass
         
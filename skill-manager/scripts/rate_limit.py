@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+rate_limit.py - GitHub API 请求调度器
+
+所有 GitHub API 请求经由 api_request() 发出：
+- 读取 X-RateLimit-Remaining / X-RateLimit-Reset / Retry-After，配额越少并发越低
+- 触发限流（403/429）、5xx 或网络错误时按带抖动的指数退避重试
+- 等待名额时按优先级排队：HEAD 查询 > tree > blob 下载
+- 可设置本次运行最多消耗的 API 调用数（--budget N），超出抛出 BudgetExceeded
+"""
+
+import time
+import heapq
+import random
+import itertools
+import threading
+
+import http_client
+
+# 优先级：数字越小越先执行
+PRIORITY_HEAD = 0
+PRIORITY_TREE = 1
+PRIORITY_BLOB = 2
+
+DEFAULT_MAX_CONCURRENCY = 32
+MAX_RETRIES = 4
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+# 配额耗尽时最多等待多久（秒），超过则直接报限流错误
+MAX_RESET_WAIT = 60.0
+# 剩余配额每少这么多，允许的并发数减 1
+REMAINING_PER_SLOT = 10
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class BudgetExceeded(Exception):
+    """本次运行的 API 调用预算已用完"""
+
+
+class RateLimitExceeded(Exception):
+    """GitHub API 配额耗尽且短时间内不会恢复"""
+
+
+class RequestScheduler:
+    """线程安全的 API 请求调度器"""
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY, budget=None):
+        self.max_concurrency = max_concurrency
+        self.budget = budget
+        self.spent = 0
+        self.retries = 0
+        self.remaining = None
+        self.reset_at = None
+        self._active = 0
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _allowed(self):
+        """根据剩余配额计算当前允许的并发数"""
+        if self.remaining is None:
+            return self.max_concurrency
+        if self.remaining <= 0:
+            return 0
+        return max(1, min(self.max_concurrency, self.remaining // REMAINING_PER_SLOT))
+
+    def acquire(self, priority):
+        with self._cond:
+            if self.budget is not None and self.spent >= self.budget:
+                raise BudgetExceeded(f"API call budget exhausted ({self.budget})")
+            self.spent += 1
+
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._queue, entry)
+            try:
+                while not (self._queue[0] == entry and self._active < self._allowed()):
+                    if self.remaining is not None and self.remaining <= 0:
+                        wait = (self.reset_at or 0) - time.time()
+                        if wait > MAX_RESET_WAIT:
+                            raise RateLimitExceeded("GitHub API rate limit exceeded")
+                        if wait <= 0:
+                            # 已过重置时间，恢复为未知配额
+                            self.remaining = None
+                            continue
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+            except BaseException:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+                raise
+
+            heapq.heappop(self._queue)
+            self._active += 1
+            # 队首变化，唤醒下一个等待者
+            self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def observe(self, headers):
+        """从响应头更新剩余配额"""
+        if headers is None:
+            return
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        with self._cond:
+            try:
+                if remaining is not None:
+                    self.remaining = int(remaining)
+                if reset is not None:
+                    self.reset_at = float(reset)
+            except ValueError:
+                return
+            self._cond.notify_all()
+
+    def retry_delay(self, attempt, headers=None):
+        """下一次重试前的等待时间：优先 Retry-After，其次配额重置时间，否则带抖动的指数退避"""
+        if headers is not None:
+            retry_after = headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return min(MAX_DELAY, float(retry_after))
+                except ValueError:
+                    pass
+            if headers.get('X-RateLimit-Remaining') == '0' and headers.get('X-RateLimit-Reset'):
+                try:
+                    return max(0.0, float(headers['X-RateLimit-Reset']) - time.time()) + 1
+                except ValueError:
+                    pass
+        delay = min(MAX_DELAY, BASE_DELAY * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.5)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'spent': self.spent,
+                'budget': self.budget,
+                'retries': self.retries,
+                'rate_limit_remaining': self.remaining,
+                'rate_limit_reset': self.reset_at
+            }
+
+    def request(self, method, url, priority=PRIORITY_BLOB, **kwargs):
+        """按调度规则发送 API 请求，参数同 http_client.request"""
+        for attempt in range(MAX_RETRIES + 1):
+            self.acquire(priority)
+            try:
+                response = http_client.request(method, url, **kwargs)
+            except http_client.HTTPError as e:
+                self.observe(e.headers)
+                if not _should_retry(e) or attempt == MAX_RETRIES:
+                    raise
+                delay = self.retry_delay(attempt, e.headers)
+                if delay > MAX_RESET_WAIT:
+                    raise
+            except OSError:
+                if attempt == MAX_RETRIES:
+                    raise
+                delay = self.retry_delay(attempt)
+            else:
+                self.observe(response.headers)
+                return response
+            finally:
+                self.release()
+
+            with self._cond:
+                self.retries += 1
+            time.sleep(delay)
+
+
+def _should_retry(error):
+    if error.code in RETRY_STATUS:
+        return True
+    if error.code == 403 and error.headers is not None:
+        # 403 只有在是限流（主限流或次级限流）时才值得重试
+        return (error.headers.get('X-RateLimit-Remaining') == '0'
+                or error.headers.get('Retry-After') is not None)
+    return False
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """返回进程内共享的调度器"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
+
+
+def configure_scheduler(budget=None, max_concurrency=None):
+    """设置 API 调用预算和最大并发（需在发出请求前调用）"""
+    scheduler = get_scheduler()
+    with scheduler._cond:
+        if budget is not None:
+            scheduler.budget = budget
+        if max_concurrency:
+            scheduler.max_concurrency = max_concurrency
+    return scheduler
+
+
+def api_request(method, url, priority=PRIORITY_BLOB, **kwargs):
+    """使用共享调度器发送 GitHub API 请求"""
+    return get_scheduler().request(method, url, priority=priority, **kwargs)
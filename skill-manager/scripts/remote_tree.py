@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+remote_tree.py - 按路径前缀索引的远程文件树
+
+monorepo 的递归 tree 可能有十万以上条目，而一个 skill 只关心其中一个子目录。
+RemoteTree 把 (path, blob_sha) 按路径排序存成两个平行数组：
+- get(path)         二分查找，O(log n)
+- subtree(prefix)   两次二分定位子目录的连续区间，O(log n + k)
+"""
+
+import bisect
+
+
+class RemoteTree:
+    """不可变的远程文件树 {path: blob_sha}，路径以 / 分隔"""
+
+    __slots__ = ('paths', 'shas')
+
+    def __init__(self, entries=None):
+        items = sorted(dict(entries or {}).items())
+        self.paths = [path for path, _ in items]
+        self.shas = [sha for _, sha in items]
+
+    @classmethod
+    def from_sorted(cls, paths, shas):
+        """直接使用已排序的平行数组（例如从缓存读取）"""
+        tree = cls.__new__(cls)
+        tree.paths = list(paths)
+        tree.shas = list(shas)
+        return tree
+
+    @classmethod
+    def from_json(cls, data):
+        """读取 to_json() 的结果；也接受旧缓存格式 {path: sha}"""
+        if isinstance(data, dict) and isinstance(data.get('paths'), list) and isinstance(data.get('shas'), list):
+            return cls.from_sorted(data['paths'], data['shas'])
+        return cls(data)
+
+    def to_json(self):
+        return {'paths': self.paths, 'shas': self.shas}
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, path):
+        return self.get(path) is not None
+
+    def __getitem__(self, path):
+        sha = self.get(path)
+        if sha is None:
+            raise KeyError(path)
+        return sha
+
+    def get(self, path, default=None):
+        i = bisect.bisect_left(self.paths, path)
+        if i < len(self.paths) and self.paths[i] == path:
+            return self.shas[i]
+        return default
+
+    def items(self):
+        return zip(self.paths, self.shas)
+
+    def _range(self, prefix):
+        prefix = prefix.strip('/')
+        if not prefix:
+            return 0, len(self.paths), 0
+        # 以 "prefix/" 开头的路径恰好落在 ["prefix/", "prefix0") 之间（'0' 是 '/' 的下一个字符）
+        lo = bisect.bisect_left(self.paths, prefix + '/')
+        hi = bisect.bisect_left(self.paths, prefix + '0', lo)
+        return lo, hi, len(prefix) + 1
+
+    def iter_subtree(self, prefix):
+        """按路径顺序产出 prefix 目录下的 (相对路径, sha)"""
+        lo, hi, cut = self._range(prefix)
+        for i in range(lo, hi):
+            yield self.paths[i][cut:], self.shas[i]
+
+    def subtree(self, prefix):
+        """prefix 目录下的 {相对路径: sha}"""
+        return dict(self.iter_subtree(prefix))
+
+    def subtree_size(self, prefix):
+        lo, hi, _ = self._range(prefix)
+        return hi - lo
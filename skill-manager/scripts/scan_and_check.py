@@ -3,22 +3,42 @@
 scan_and_check.py - 扫描 skills 目录并检查 GitHub 更新
 
 Usage:
-    python scan_and_check.py [skills_dir]
+    python scan_and_check.py [skills_dir] [--full] [--concurrency N] [--per-host N] [--deadline SECONDS] [--budget N]
+                             [--backend rest|git] [--hash-workers N] [--stream]
+
+    --full         跳过 github_hash 与分支 HEAD 的快速比较，强制逐文件对比
+    --concurrency  并发请求数
+    --per-host     每个 host 的 keep-alive 连接数
+    --deadline     整体截止时间（秒）
+    --budget       本次运行最多消耗的 GitHub API 调用数
+    --backend      远程数据后端: rest (GitHub API，默认) 或 git (本地 blobless 部分克隆)
+    --stream       每个 skill 一完成就输出一行 JSON (NDJSON)，最后输出一行 summary
+    --hash-workers 本地文件 hash 的线程数
 
 默认路径: 自动检测 (e.g. ~/.config/opencode/skills, ~/.codefuse/skills) 或使用 SKILLS_DIR 环境变量
 """
 
 import os
+import re
 import sys
-import yaml
 import json
 import subprocess
+import asyncio
+import argparse
 import concurrent.futures
-import urllib.request
-import urllib.error
 import hashlib
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from skill_index import get_skill_index
+from http_cache import get_http_cache
+from git_backend import get_git_backend
+from remote_tree import RemoteTree
+from tree_cache import get_tree_cache
+import http_client
+from rate_limit import (api_request, configure_scheduler, get_scheduler, BudgetExceeded,
+                        RateLimitExceeded, PRIORITY_HEAD, PRIORITY_TREE)
+
 # 默认 skills 路径（跨平台）
 def get_default_skills_dir():
     # Priority 1: Environment variable
@@ -45,6 +65,27 @@ def get_default_skills_dir():
 
 DEFAULT_SKILLS_DIR = get_default_skills_dir()
 
+# GitHub API 地址，可通过环境变量指向 GitHub Enterprise 或本地测试服务
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip('/')
+GITHUB_GRAPHQL_URL = os.getenv("GITHUB_GRAPHQL_URL", f"{GITHUB_API_URL}/graphql")
+
+# 单次 GraphQL 请求最多查询的仓库数
+GRAPHQL_BATCH_SIZE = 100
+
+# 检查引擎的默认并发数与每个 host 的连接数
+DEFAULT_CONCURRENCY = 32
+DEFAULT_PER_HOST = 16
+
+# 本地 hash 阶段的线程数，以及每个任务处理的文件数
+DEFAULT_HASH_WORKERS = 8
+HASH_BATCH_SIZE = 64
+
+# 远程数据后端: rest (GitHub API) 或 git (git_backend.py 的部分克隆)，可用 --backend 覆盖
+BACKENDS = ('rest', 'git')
+_backend = os.getenv("SKILL_MANAGER_BACKEND", "rest")
+
+_SHA_RE = re.compile(r'^[0-9a-f]{40}$')
+
 
 
 
@@ -86,48 +127,69 @@ def parse_github_url(github_url):
 
 
 
-def get_local_file_hash(file_path):
-    """计算本地文件的 Git Blob SHA1 hash"""
-    try:
-        with open(file_path, 'rb') as f:
-            content = f.read()
-        
+# 流式计算 hash 时每次读取的块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _hash_file_stream(file_path):
+    """分块读取文件计算 Git Blob SHA1，内存占用与文件大小无关"""
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
         # Git blob header: "blob <size>\0"
-        header = f"blob {len(content)}\0".encode('utf-8')
-        store = header + content
-        return hashlib.sha1(store).hexdigest()
+        sha = hashlib.sha1(f"blob {size}\0".encode('utf-8'))
+        read = 0
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha.update(chunk)
+            read += len(chunk)
+    if read != size:
+        # 读取过程中文件被修改
+        return None
+    return sha.hexdigest()
+
+
+def get_local_file_hash(file_path, index=None):
+    """
+    计算本地文件的 Git Blob SHA1 hash。
+    传入 index (SkillIndex) 时先按 (path, size, mtime_ns, inode) 查缓存，未变化的文件不会被重新读取。
+    """
+    try:
+        abs_path = os.path.abspath(file_path)
+        st = os.stat(abs_path)
+        if index is not None:
+            cached = index.get_file_hash(abs_path, st)
+            if cached:
+                return cached
+
+        digest = _hash_file_stream(abs_path)
+        if digest and index is not None:
+            index.put_file_hash(abs_path, st, digest)
+        return digest
     except Exception:
         return None
 
 
-def scan_skills(skills_root):
-    """扫描所有子目录，提取含 github_url 的 skill 元数据。"""
+def _skill_index_for(skill):
+    """skill 目录的上一级就是 skills 根目录"""
+    return get_skill_index(os.path.dirname(os.path.abspath(skill['dir'])))
+
+
+def scan_skills(skills_root, hash_files=True, names=None):
+    """
+    扫描所有子目录，提取含 github_url 的 skill 元数据。
+    frontmatter 来自 skill_index 的持久化索引，只有变化过的 SKILL.md 会被重新解析。
+    hash_files=False 时不计算 tracked_files 的本地 hash，留给检查引擎的并行 hash 阶段
+    （HEAD 未变化的 skill 完全不需要计算）。
+    names 不为 None 时只扫描这些目录名。
+    """
     skill_list = []
     
     if not os.path.exists(skills_root):
         print(f"Skills root not found: {skills_root}", file=sys.stderr)
         return []
 
-    for item in os.listdir(skills_root):
-        skill_dir = os.path.join(skills_root, item)
-        if not os.path.isdir(skill_dir):
-            continue
-            
-        skill_md = os.path.join(skill_dir, "SKILL.md")
-        if not os.path.exists(skill_md):
-            continue
-            
+    index = get_skill_index(skills_root)
+    for item, skill_dir, frontmatter in index.refresh(names):
         try:
-            with open(skill_md, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-            # 提取 YAML frontmatter
-            parts = content.split('---')
-            if len(parts) < 3:
-                continue
-                
-            frontmatter = yaml.safe_load(parts[1])
-            
             # 只收集有 github_url 的 skill
             if frontmatter and 'github_url' in frontmatter:
                 skill_data = {
@@ -140,25 +202,28 @@ def scan_skills(skills_root):
                 }
                 
                 # 如果有 tracked_files，计算本地文件 hash
-                if skill_data["tracked_files"]:
+                if skill_data["tracked_files"] and hash_files:
                     for file_info in skill_data["tracked_files"]:
                         file_path = os.path.join(skill_dir, file_info['path'])
-                        local_hash = get_local_file_hash(file_path)
+                        local_hash = get_local_file_hash(file_path, index)
                         file_info['local_hash'] = local_hash or 'unknown'
                 
                 skill_list.append(skill_data)
         except Exception:
             pass
-            
+    
+    index.flush()
     return skill_list
 
 
 def fetch_repo_tree(owner, repo, branch):
     """
     使用 GitHub API 获取完整的仓库文件树（递归）。
-    返回一个字典: {path: sha}
+    返回按路径前缀索引的 RemoteTree {path: sha}
+    branch 为分支名时请求带 ETag / Last-Modified 条件头，304 时直接复用本地缓存的解析结果；
+    为 commit SHA 时 tree 不会变化，由 tree_cache 缓存，这里不再读写 HTTP 缓存。
     """
-    api_url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{branch}?recursive=1"
+    api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/git/trees/{branch}?recursive=1"
     headers = {
         'Accept': 'application/vnd.github.v3+json',
         'User-Agent': 'opencode-skill-manager'
@@ -169,40 +234,54 @@ def fetch_repo_tree(owner, repo, branch):
     if token:
         headers['Authorization'] = f'token {token}'
     
+    cache = None if _SHA_RE.match(branch) else get_http_cache()
+    cached = cache.get(api_url) if cache else None
+    if cache:
+        headers.update(cache.conditional_headers(cached))
+    
     try:
-        req = urllib.request.Request(api_url, headers=headers)
-        with urllib.request.urlopen(req, timeout=20) as response:
+        with api_request('GET', api_url, priority=PRIORITY_TREE, headers=headers) as response:
             if response.status != 200:
                  raise Exception(f"GitHub API error: {response.status}")
             
             data = json.loads(response.read().decode('utf-8'))
             
             if 'tree' not in data:
-                return {}
+                return RemoteTree()
             
-            # 构建路径 -> sha 映射
-            tree_map = {}
-            for item in data['tree']:
-                if item['type'] == 'blob':
-                    tree_map[item['path']] = item['sha']
-            return tree_map
-
-    except urllib.error.HTTPError as e:
-        if e.code == 404:
+            # 构建路径 -> sha 索引
+            tree = RemoteTree((item['path'], item['sha']) for item in data['tree'] if item['type'] == 'blob')
+            
+            # 缓存中存排好序的数组，读取时不必重新排序
+            if cache:
+                cache.put(api_url, response.headers.get('ETag'),
+                          response.headers.get('Last-Modified'), tree.to_json())
+            return tree
+
+    except http_client.HTTPError as e:
+        if e.code == 304 and cached:
+             return RemoteTree.from_json(cached['data'])
+        elif e.code == 404:
              raise Exception(f"Repository or branch not found: {owner}/{repo}@{branch}")
         elif e.code == 403:
              raise Exception("GitHub API rate limit exceeded")
         else:
              raise Exception(f"GitHub API error: {e.code}")
+    except (BudgetExceeded, RateLimitExceeded):
+        raise
     except Exception as e:
         raise Exception(f"Network error: {str(e)}")
 
 
 def get_latest_commit_sha(owner, repo, branch):
-    """获取指定分支的最新 commit SHA"""
-    api_url = f"https://api.github.com/repos/{owner}/{repo}/commits/{branch}"
+    """
+    获取指定分支的最新 commit SHA，失败时返回 None。
+    使用 application/vnd.github.sha 媒体类型，响应体只有 40 字节的 SHA 文本。
+    API 调用预算用完或触发限流时抛出 BudgetExceeded / RateLimitExceeded，与 tree、blob 请求一致。
+    """
+    api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/commits/{branch}"
     headers = {
-        'Accept': 'application/vnd.github.v3+json',
+        'Accept': 'application/vnd.github.sha',
         'User-Agent': 'opencode-skill-manager'
     }
     
@@ -211,20 +290,129 @@ def get_latest_commit_sha(owner, repo, branch):
         headers['Authorization'] = f'token {token}'
         
     try:
-        req = urllib.request.Request(api_url, headers=headers)
-        with urllib.request.urlopen(req, timeout=20) as response:
+        with api_request('GET', api_url, priority=PRIORITY_HEAD, headers=headers) as response:
             if response.status == 200:
-                data = json.loads(response.read().decode('utf-8'))
-                return data.get('sha')
+                sha = response.read().decode('utf-8').strip()
+                return sha or None
             return None
+    except (BudgetExceeded, RateLimitExceeded):
+        raise
+    except Exception:
+        return None
+
+
+def set_backend(name):
+    """选择远程数据后端（需在发出请求前调用）"""
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name}")
+    _backend = name
+
+
+def get_backend():
+    return _backend
+
+
+def fetch_remote_tree(owner, repo, ref):
+    """
+    通过当前后端获取 ref 处的 RemoteTree {path: sha}。
+    ref 是 commit SHA 时先查磁盘 tree 缓存（commit 的 tree 不会变，命中即可直接使用），
+    未命中时获取后写入缓存；分支名不缓存。
+    """
+    cache = get_tree_cache()
+    tree = cache.get(owner, repo, ref)
+    if tree is not None:
+        return tree
+    if _backend == 'git':
+        tree = get_git_backend().fetch_tree(owner, repo, ref)
+    else:
+        tree = fetch_repo_tree(owner, repo, ref)
+    cache.put(owner, repo, ref, tree)
+    return tree
+
+
+def resolve_head(owner, repo, branch):
+    """通过当前后端获取分支 HEAD 的 commit SHA，失败时返回 None"""
+    if _backend == 'git':
+        return get_git_backend().resolve_head(owner, repo, branch)
+    return get_latest_commit_sha(owner, repo, branch)
+
+
+def fetch_base_tree(skill, head_sha, head_tree, fetch=True):
+    """
+    未使用 tracked_files 的 skill 在记录的 github_hash 处的 RemoteTree，
+    用来判断远程子目录中哪些文件是之后才新增的。
+    tracked skill 不需要，返回 None；github_hash 无效或获取失败时也返回 None（此时不标记新增文件）。
+    fetch=False 时只查 tree 缓存，不访问网络。
+    """
+    if skill.get('tracked_files'):
+        return None
+    base_sha = skill.get('local_hash')
+    info = skill.get('_github_info')
+    if not info or not base_sha or not _SHA_RE.match(base_sha):
+        return None
+    if base_sha == head_sha:
+        return head_tree
+    if not fetch:
+        return get_tree_cache().get(info['owner'], info['repo'], base_sha)
+    try:
+        return fetch_remote_tree(info['owner'], info['repo'], base_sha)
+    except (BudgetExceeded, RateLimitExceeded):
+        raise
     except Exception:
         return None
 
 
-def evaluate_skill_update(skill, tree_data):
+def list_local_files(skill):
+    """
+    需要与远程对比的本地文件 [(rel_path, abs_path)]。
+    有 tracked_files 时只返回还没有 local_hash 的 tracked 文件；否则遍历 skill 目录（跳过 . 开头的文件）。
+    """
+    skill_dir = skill['dir']
+    if skill.get('tracked_files'):
+        return [(tf['path'], os.path.join(skill_dir, tf['path']))
+                for tf in skill['tracked_files'] if not tf.get('local_hash')]
+    
+    files_found = []
+    for root, dirs, files in os.walk(skill_dir):
+        for file in files:
+            if file.startswith('.'):
+                continue
+            abs_path = os.path.join(root, file)
+            files_found.append((os.path.relpath(abs_path, skill_dir), abs_path))
+    return files_found
+
+
+def hash_file_batch(skill, batch):
+    """计算一批 (rel_path, abs_path) 的 hash，返回 {rel_path: hash}"""
+    index = _skill_index_for(skill)
+    return {rel_path: get_local_file_hash(abs_path, index) for rel_path, abs_path in batch}
+
+
+async def hash_local_files_async(skill, executor):
+    """
+    本地 hash 阶段：在独立的线程池中分批计算 skill 的本地文件 hash，
+    与网络请求并行进行。hash 缓存（SQLite）在线程间共享。返回 {rel_path: hash}。
+    """
+    loop = asyncio.get_running_loop()
+    files = await loop.run_in_executor(executor, list_local_files, skill)
+    batches = [files[i:i + HASH_BATCH_SIZE] for i in range(0, len(files), HASH_BATCH_SIZE)]
+    local_hashes = {}
+    for part in await asyncio.gather(*(loop.run_in_executor(executor, hash_file_batch, skill, batch)
+                                       for batch in batches)):
+        local_hashes.update(part)
+    return local_hashes
+
+
+def evaluate_skill_update(skill, tree_data, local_hashes=None, base_tree=None):
     """
     对比本地 skill 文件与远程 tree 数据。
-    如果是 repo-tracked (无 tracked_files)，则自动扫描本地文件。
+    如果是 repo-tracked (无 tracked_files)，则自动扫描本地文件；
+    远程子目录中本地没有、且在 github_hash 处的 tree（base_tree）中也不存在的文件
+    （即上游新增的文件，. 开头的除外，与本地扫描规则一致）记为 missing_local。
+    base_tree 为 None 时不标记新增文件：包装型 skill 本来就只含仓库的一小部分。
+    有 tracked_files 时只有本地缺失的 tracked 文件记为 missing_local。
+    local_hashes: hash 阶段预先算好的 {rel_path: hash}；为 None 时在这里串行计算。
     更新 skill 对象的状态。
     """
     github_info = skill.get('_github_info')
@@ -236,56 +424,52 @@ def evaluate_skill_update(skill, tree_data):
     base_path = github_info['path']
     base_path = base_path.strip('/')
     
+    # 只取出 skill 子目录下的条目（两次二分），之后按相对路径查找
+    if not isinstance(tree_data, RemoteTree):
+        tree_data = RemoteTree(tree_data)
+    remote_files = tree_data.subtree(base_path)
+    
     skill['file_status'] = {}
     skill['status'] = 'current'
     skill['message'] = 'Up to date'
+    skill['reason'] = 'tree_compared'
     
     files_to_check = []
     
+    if local_hashes is None:
+        local_hashes = hash_file_batch(skill, list_local_files(skill))
+    
     if skill.get('tracked_files'):
         for tf in skill['tracked_files']:
             files_to_check.append({
                 'path': tf['path'],
-                'local_hash': tf.get('local_hash')
+                'local_hash': tf.get('local_hash') or local_hashes.get(tf['path'])
             })
     else:
         # 自动扫描本地目录
-        skill_dir = skill['dir']
-        for root, dirs, files in os.walk(skill_dir):
-            for file in files:
-                if file.startswith('.'):
-                    continue
-                
-                abs_path = os.path.join(root, file)
-                rel_path = os.path.relpath(abs_path, skill_dir)
-                local_hash = get_local_file_hash(abs_path)
-                
-                files_to_check.append({
-                    'path': rel_path,
-                    'local_hash': local_hash
-                })
+        for rel_path, local_hash in local_hashes.items():
+            files_to_check.append({
+                'path': rel_path,
+                'local_hash': local_hash
+            })
 
     changes_found = False
     
-    if not files_to_check:
+    if not files_to_check and not remote_files:
         skill['message'] = 'No files to check'
         return
 
+    tracked = bool(skill.get('tracked_files'))
     for file_info in files_to_check:
         rel_path = file_info['path']
         local_hash = file_info.get('local_hash') or 'unknown'
-        
-        # 构建远程全路径
-        if base_path:
-            remote_full_path = f"{base_path}/{rel_path}"
-        else:
-            remote_full_path = rel_path
-            
-        remote_full_path = remote_full_path.replace('\\', '/')
-        remote_hash = tree_data.get(remote_full_path)
+        remote_hash = remote_files.pop(rel_path.replace('\\', '/'), None)
         
         file_status = 'current'
-        if remote_hash is None:
+        if remote_hash is not None and tracked and not os.path.exists(os.path.join(skill['dir'], rel_path)):
+            file_status = 'missing_local'
+            changes_found = True
+        elif remote_hash is None:
             file_status = 'missing_remote'
             if skill.get('tracked_files'):
                 changes_found = True
@@ -299,20 +483,139 @@ def evaluate_skill_update(skill, tree_data):
             'remote_hash': remote_hash
         }
     
+    # 剩下的远程条目本地都没有（remote_files 已去掉比对过的路径），
+    # 其中 github_hash 时已经存在的是 skill 有意没有包含的文件，只有新增的才需要下载
+    if not tracked and base_tree is not None:
+        if not isinstance(base_tree, RemoteTree):
+            base_tree = RemoteTree(base_tree)
+        for rel_path, remote_hash in remote_files.items():
+            if os.path.basename(rel_path).startswith('.'):
+                continue
+            if (f"{base_path}/{rel_path}" if base_path else rel_path) in base_tree:
+                continue
+            skill['file_status'][rel_path] = {
+                'status': 'missing_local',
+                'local_hash': None,
+                'remote_hash': remote_hash
+            }
+            changes_found = True
+    
     if changes_found:
         skill['status'] = 'outdated'
         skill['message'] = 'File changes detected'
 
 
-def check_updates(skills):
+def fetch_heads_graphql(repo_keys):
     """
-    并发检查所有 skill 的更新状态（基于文件粒度）。
-    使用 GitHub Trees API 批量获取远程状态。
+    用一次 GraphQL POST 查询多个 (owner, repo, branch) 的 HEAD commit oid。
+    GraphQL API 需要 token。返回 {key: oid}，仓库或分支不存在的为 None。
     """
-    repo_map = {}
-    results = []
+    token = os.getenv('GITHUB_TOKEN')
+    if not token:
+        raise Exception("GraphQL API requires GITHUB_TOKEN")
+    
+    fields = []
+    for i, (owner, repo, branch) in enumerate(repo_keys):
+        fields.append(
+            f'r{i}: repository(owner: {json.dumps(owner)}, name: {json.dumps(repo)}) '
+            f'{{ ref(qualifiedName: {json.dumps("refs/heads/" + branch)}) {{ target {{ oid }} }} }}'
+        )
+    query = "query { " + " ".join(fields) + " }"
     
-    # 1. 按仓库分组
+    headers = {
+        'Content-Type': 'application/json',
+        'User-Agent': 'opencode-skill-manager',
+        'Authorization': f'bearer {token}'
+    }
+    body = json.dumps({'query': query}).encode('utf-8')
+    with api_request('POST', GITHUB_GRAPHQL_URL, priority=PRIORITY_HEAD, headers=headers, body=body) as response:
+        data = response.json()
+    
+    if not data.get('data'):
+        raise Exception(f"GraphQL error: {data.get('errors')}")
+    
+    heads = {}
+    for i, key in enumerate(repo_keys):
+        node = data['data'].get(f'r{i}') or {}
+        ref = node.get('ref') or {}
+        heads[key] = (ref.get('target') or {}).get('oid')
+    return heads
+
+
+async def resolve_repo_heads_async(repo_keys, run, errors=None):
+    """
+    查询每个 (owner, repo, branch) 的 HEAD commit SHA，失败的为 None。
+    因 API 预算用完或限流而失败的仓库同时把异常记入 errors（dict，可选），
+    调用方据此给出明确的错误信息。
+    有 GITHUB_TOKEN 时按 GRAPHQL_BATCH_SIZE 分批走 GraphQL，一批一个请求；
+    GraphQL 失败的批次以及没有 token 时退回逐个仓库的 REST 请求。
+    git 后端逐个仓库执行 git ls-remote。
+    run: 在线程池中执行阻塞调用的协程函数，由检查引擎提供并发控制。
+    """
+    heads = {}
+    pending = list(repo_keys)
+    
+    if pending and os.getenv('GITHUB_TOKEN') and _backend == 'rest':
+        batches = [repo_keys[i:i + GRAPHQL_BATCH_SIZE] for i in range(0, len(repo_keys), GRAPHQL_BATCH_SIZE)]
+        outcomes = await asyncio.gather(
+            *(run(fetch_heads_graphql, batch) for batch in batches),
+            return_exceptions=True
+        )
+        pending = []
+        for batch, outcome in zip(batches, outcomes):
+            if isinstance(outcome, Exception):
+                print(f"Warning: GraphQL head lookup failed, falling back to REST: {outcome}", file=sys.stderr)
+                pending.extend(batch)
+            else:
+                heads.update(outcome)
+    
+    if pending:
+        shas = await asyncio.gather(
+            *(run(resolve_head, k[0], k[1], k[2]) for k in pending),
+            return_exceptions=True
+        )
+        for key, sha in zip(pending, shas):
+            if isinstance(sha, (BudgetExceeded, RateLimitExceeded)):
+                if errors is not None:
+                    errors[key] = sha
+                sha = None
+            elif isinstance(sha, BaseException):
+                raise sha
+            heads[key] = sha
+    return heads
+
+
+def apply_head_shortcut(repo_map, heads, results):
+    """
+    github_hash 与分支 HEAD 一致的 skill 直接判定为 current，不再拉取 tree 和计算本地 hash。
+    从 repo_map 中移除已判定的 skill，返回命中数量。
+    """
+    hits = 0
+    for key in list(repo_map.keys()):
+        head = heads.get(key)
+        if not head:
+            continue
+        remaining = []
+        for skill in repo_map[key]:
+            skill['remote_head'] = head
+            if skill.get('local_hash') == head:
+                skill['status'] = 'current'
+                skill['message'] = 'Up to date'
+                skill['reason'] = 'head_unchanged'
+                results.append(skill)
+                hits += 1
+            else:
+                remaining.append(skill)
+        if remaining:
+            repo_map[key] = remaining
+        else:
+            del repo_map[key]
+    return hits
+
+
+def group_skills_by_repo(skills, results):
+    """按 (owner, repo, branch) 分组，URL 无效的 skill 直接以 error 写入 results"""
+    repo_map = {}
     for skill in skills:
         info = parse_github_url(skill['github_url'])
         if info:
@@ -325,60 +628,231 @@ def check_updates(skills):
             skill['status'] = 'error'
             skill['message'] = 'Invalid GitHub URL'
             results.append(skill)
+    return repo_map
+
+
+async def check_updates_async(skills, use_head_shortcut=True, concurrency=DEFAULT_CONCURRENCY,
+                              per_host=DEFAULT_PER_HOST, deadline=None, on_result=None,
+                              hash_workers=DEFAULT_HASH_WORKERS):
+    """
+    异步检查所有 skill 的更新状态（基于文件粒度）。
+    先比较 github_hash 与分支 HEAD（每个仓库一个很小的请求），
+    只有不一致的仓库才获取远程 tree（按 commit SHA，优先读取磁盘 tree 缓存）。
     
-    # 2. 并发获取仓库 Tree
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_repo = {
-            executor.submit(fetch_repo_tree, k[0], k[1], k[2]): k 
-            for k in repo_map.keys()
-        }
+    concurrency: 同时进行的阻塞调用（网络请求、本地 hash）上限
+    per_host: 连接池中每个 host 的 keep-alive 连接上限
+    deadline: 整体截止时间（秒），超时仍未完成的 skill 标记为 error
+    on_result: 每个 skill 得出结果时立即调用 on_result(skill)（在事件循环线程中），
+               不必等所有仓库完成
+    hash_workers: 本地 hash 阶段的线程数。需要对比文件的 skill 在 HEAD 快速路径之后
+                  立即开始计算本地 hash，与 tree 请求同时进行
+    """
+    results = []
+    emitted = 0
+    
+    def emit_new():
+        nonlocal emitted
+        if on_result is None:
+            return
+        while emitted < len(results):
+            on_result(results[emitted])
+            emitted += 1
+    
+    repo_map = group_skills_by_repo(skills, results)
+    emit_new()
+    
+    # 单个请求的超时也不超过整体截止时间，避免超时后线程还长时间挂在慢仓库上
+    timeout = min(http_client.DEFAULT_TIMEOUT, deadline) if deadline else None
+    http_client.configure_pool(max_per_host=per_host, timeout=timeout)
+    loop = asyncio.get_running_loop()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+    hash_executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, hash_workers))
+    limit = asyncio.Semaphore(concurrency)
+    hash_tasks = {}
+    
+    async def run(fn, *args):
+        async with limit:
+            return await loop.run_in_executor(executor, fn, *args)
+    
+    def start_hashing(skill):
+        task = hash_tasks.get(id(skill))
+        if task is None:
+            task = asyncio.ensure_future(hash_local_files_async(skill, hash_executor))
+            hash_tasks[id(skill)] = task
+        return task
+    
+    async def check_repo(key, ref):
+        repo_skills = repo_map[key]
+        try:
+            tree_data = await run(fetch_remote_tree, key[0], key[1], ref)
+        except Exception as e:
+            for skill in repo_skills:
+                skill['status'] = 'error'
+                skill['message'] = f"Remote check failed: {str(e)}"
+                results.append(skill)
+            emit_new()
+            return
         
-        for future in concurrent.futures.as_completed(future_to_repo):
-            owner, repo, branch = future_to_repo[future]
-            repo_skills = repo_map[(owner, repo, branch)]
-            
+        head_sha = ref if _SHA_RE.match(ref) else None
+        for skill in repo_skills:
             try:
-                tree_data = future.result()
-                for skill in repo_skills:
-                    try:
-                        evaluate_skill_update(skill, tree_data)
-                    except Exception as e:
-                        skill['status'] = 'error'
-                        skill['message'] = f"Evaluation error: {str(e)}"
-                    results.append(skill)
+                local_hashes = await start_hashing(skill)
+                base_tree = await run(fetch_base_tree, skill, head_sha, tree_data)
+                evaluate_skill_update(skill, tree_data, local_hashes, base_tree)
             except Exception as e:
-                for skill in repo_skills:
-                    skill['status'] = 'error'
-                    skill['message'] = f"Remote check failed: {str(e)}"
-                    results.append(skill)
-                    
+                skill['status'] = 'error'
+                skill['message'] = f"Evaluation error: {str(e)}"
+            results.append(skill)
+            emit_new()
+    
+    async def engine():
+        # 1. 解析分支 HEAD：既用于快速路径，也让 tree 按 commit SHA 获取以命中 tree 缓存
+        head_errors = {}
+        heads = await resolve_repo_heads_async(list(repo_map.keys()), run, head_errors)
+        for key, error in head_errors.items():
+            for skill in repo_map.pop(key):
+                skill['status'] = 'error'
+                skill['message'] = f"Remote check failed: {error}"
+                results.append(skill)
+        emit_new()
+        if use_head_shortcut:
+            apply_head_shortcut(repo_map, heads, results)
+            emit_new()
+        else:
+            for key, repo_skills in repo_map.items():
+                if heads.get(key):
+                    for skill in repo_skills:
+                        skill['remote_head'] = heads[key]
+        
+        # 剩下的 skill 都要逐文件对比：本地 hash 与 tree 请求并行
+        for repo_skills in repo_map.values():
+            for skill in repo_skills:
+                start_hashing(skill)
+        
+        # 2. 并发获取仓库 Tree（已知 HEAD 时按 commit SHA 获取，保证与记录的 remote_head 一致）
+        await asyncio.gather(*(check_repo(k, heads.get(k) or k[2]) for k in list(repo_map.keys())))
+    
+    try:
+        if deadline:
+            await asyncio.wait_for(engine(), timeout=deadline)
+        else:
+            await engine()
+    except asyncio.TimeoutError:
+        finished = set(id(s) for s in results)
+        for skill in skills:
+            if id(skill) not in finished:
+                skill['status'] = 'error'
+                skill['message'] = f"Check deadline exceeded ({deadline}s)"
+                results.append(skill)
+        emit_new()
+    finally:
+        for task in hash_tasks.values():
+            task.cancel()
+        # 超时后仍在运行的阻塞调用不再等待
+        executor.shutdown(wait=False)
+        hash_executor.shutdown(wait=False)
+    
+    for skill in skills:
+        if os.path.isdir(skill.get('dir', '')):
+            _skill_index_for(skill).flush()
+    
     return results
 
 
+def check_updates(skills, use_head_shortcut=True, **options):
+    """check_updates_async 的同步包装，参数相同"""
+    return asyncio.run(check_updates_async(skills, use_head_shortcut=use_head_shortcut, **options))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="扫描 skills 目录并检查 GitHub 更新")
+    parser.add_argument("skills_dir", nargs="?", default=DEFAULT_SKILLS_DIR)
+    parser.add_argument("--full", action="store_true",
+                        help="跳过 github_hash 与分支 HEAD 的快速比较，强制逐文件对比")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"并发请求数 (默认 {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST,
+                        help=f"每个 host 的 keep-alive 连接数 (默认 {DEFAULT_PER_HOST})")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="整体截止时间（秒），超时未完成的 skill 记为 error")
+    parser.add_argument("--budget", type=int, default=None,
+                        help="本次运行最多消耗的 GitHub API 调用数")
+    parser.add_argument("--backend", choices=BACKENDS, default=_backend,
+                        help=f"远程数据后端 (默认 {_backend}，可用 SKILL_MANAGER_BACKEND 设置)")
+    parser.add_argument("--hash-workers", type=int, default=DEFAULT_HASH_WORKERS,
+                        help=f"本地文件 hash 的线程数，与网络请求并行 (默认 {DEFAULT_HASH_WORKERS})")
+    parser.add_argument("--stream", action="store_true",
+                        help="NDJSON 输出：每个 skill 完成即输出一行，最后一行为 summary")
+    return parser.parse_args(argv)
+
+
+class StreamPrinter:
+    """--stream 模式：逐行输出结果，只保留计数，输出后释放逐文件状态"""
+
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.counts = {"total": 0, "outdated": 0, "current": 0, "errors": 0}
+
+    def __call__(self, skill):
+        self.counts["total"] += 1
+        key = "errors" if skill.get('status') == 'error' else skill.get('status')
+        if key in self.counts:
+            self.counts[key] += 1
+        record = {"type": "skill"}
+        record.update(skill)
+        self.out.write(json.dumps(record) + "\n")
+        self.out.flush()
+        skill.pop('file_status', None)
+
+    def summary(self):
+        record = {"type": "summary"}
+        record.update(self.counts)
+        record["connections"] = http_client.get_stats()
+        record["api_calls"] = get_scheduler().stats()
+        record["tree_cache"] = dict(get_tree_cache().stats)
+        self.out.write(json.dumps(record) + "\n")
+        self.out.flush()
+
+
 def main():
-    if len(sys.argv) > 1:
-        target_dir = sys.argv[1]
-    else:
-        target_dir = DEFAULT_SKILLS_DIR
+    args = parse_args(sys.argv[1:])
+    target_dir = args.skills_dir
+    configure_scheduler(budget=args.budget, max_concurrency=args.concurrency)
+    set_backend(args.backend)
+    # NDJSON 模式下每条记录都必须是一行
+    indent = None if args.stream else 2
     
     # 确保路径存在
     if not os.path.exists(target_dir):
         print(json.dumps({
             "error": f"Skills directory not found: {target_dir}",
             "skills": []
-        }, indent=2))
+        }, indent=indent))
         sys.exit(1)
 
-    skills = scan_skills(target_dir)
+    skills = scan_skills(target_dir, hash_files=False)
     
     if not skills:
         print(json.dumps({
             "message": "No GitHub-managed skills found",
             "skills": []
-        }, indent=2))
+        }, indent=indent))
         sys.exit(0)
     
-    updates = check_updates(skills)
+    printer = StreamPrinter() if args.stream else None
+    updates = check_updates(
+        skills,
+        use_head_shortcut=not args.full,
+        concurrency=args.concurrency,
+        per_host=args.per_host,
+        deadline=args.deadline,
+        on_result=printer,
+        hash_workers=args.hash_workers
+    )
+    
+    if printer:
+        printer.summary()
+        return
     
     # 统计
     outdated = [s for s in updates if s['status'] == 'outdated']
@@ -390,7 +864,10 @@ def main():
             "total": len(updates),
             "outdated": len(outdated),
             "current": len(current),
-            "errors": len(errors)
+            "errors": len(errors),
+            "connections": http_client.get_stats(),
+            "api_calls": get_scheduler().stats(),
+            "tree_cache": dict(get_tree_cache().stats)
         },
         "skills": updates
     }
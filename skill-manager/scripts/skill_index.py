@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+skill_index.py - skills 元数据持久化索引
+
+在 skills 根目录下维护 .skill-manager/index.sqlite，按 skill 目录记录
+SKILL.md 的 mtime/size/inode 以及解析后的 frontmatter。
+只有 stat 信息发生变化的 SKILL.md 才会被重新读取和 YAML 解析，
+scan_skills 与 list_skills 都通过这里读取元数据。
+
+同一个数据库里还缓存了本地文件的 Git blob hash，
+按 (path, size, mtime_ns, inode) 命中，未变化的文件不会被重新读取。
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import threading
+import time
+import atexit
+import yaml
+
+# skill-manager 在 skills 根目录下的状态目录（以 . 开头，list/scan 会自动跳过）
+STATE_DIRNAME = ".skill-manager"
+INDEX_FILENAME = "index.sqlite"
+
+# mtime 距今不足该秒数的文件不写入 hash 缓存，避免同一时间粒度内的再次修改被漏掉
+RACY_WINDOW_SECONDS = 2
+# 累积多少条 hash 记录后批量写入数据库
+HASH_FLUSH_THRESHOLD = 500
+
+
+def get_state_dir(skills_root):
+    """返回 skills 根目录下 skill-manager 的状态目录路径"""
+    return os.path.join(skills_root, STATE_DIRNAME)
+
+
+def parse_frontmatter(skill_md):
+    """读取 SKILL.md 并解析 YAML frontmatter，失败或格式不对时返回 None"""
+    with open(skill_md, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    parts = content.split('---')
+    if len(parts) < 3:
+        return None
+
+    frontmatter = yaml.safe_load(parts[1])
+    if not isinstance(frontmatter, dict):
+        return None
+    return frontmatter
+
+
+class SkillIndex:
+    """
+    SKILL.md 元数据索引。
+
+    索引只是缓存：数据库无法创建或损坏时退化为每次直接解析，结果不变。
+    """
+
+    def __init__(self, skills_root):
+        self.skills_root = skills_root
+        self.path = os.path.join(get_state_dir(skills_root), INDEX_FILENAME)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pending_hashes = {}
+
+        if not os.path.isdir(skills_root):
+            return
+        try:
+            os.makedirs(get_state_dir(skills_root), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._init_schema()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Warning: skill index disabled ({e})", file=sys.stderr)
+            self._conn = None
+
+    def _init_schema(self):
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS skills ("
+                " dir TEXT PRIMARY KEY,"
+                " mtime_ns INTEGER NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " inode INTEGER NOT NULL,"
+                " frontmatter TEXT)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS file_hashes ("
+                " path TEXT PRIMARY KEY,"
+                " size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " inode INTEGER NOT NULL,"
+                " sha TEXT NOT NULL)"
+            )
+
+    def close(self):
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _load_rows(self):
+        if self._conn is None:
+            return {}
+        try:
+            rows = self._conn.execute(
+                "SELECT dir, mtime_ns, size, inode, frontmatter FROM skills"
+            ).fetchall()
+        except sqlite3.Error:
+            return {}
+        return {row[0]: row[1:] for row in rows}
+
+    def refresh(self, names=None):
+        """
+        扫描 skills 根目录，返回 [(dir_name, skill_dir, frontmatter)]，按目录名排序。
+
+        没有 SKILL.md 或解析失败的目录 frontmatter 为 None。
+        只有 SKILL.md 的 (mtime_ns, size, inode) 变化时才重新解析。
+        names 不为 None 时只检查这些目录（不列出根目录），其中已不存在的从索引中删除。
+        """
+        entries = []
+        if not os.path.exists(self.skills_root):
+            return entries
+
+        with self._lock:
+            cached = self._load_rows()
+            changed = []
+            seen = set()
+
+            items = os.listdir(self.skills_root) if names is None else names
+            for item in sorted(items):
+                skill_dir = os.path.join(self.skills_root, item)
+                if not os.path.isdir(skill_dir):
+                    continue
+
+                skill_md = os.path.join(skill_dir, "SKILL.md")
+                try:
+                    st = os.stat(skill_md)
+                except OSError:
+                    entries.append((item, skill_dir, None))
+                    continue
+
+                seen.add(item)
+                key = (st.st_mtime_ns, st.st_size, st.st_ino)
+                row = cached.get(item)
+                if row is not None and tuple(row[:3]) == key:
+                    frontmatter = json.loads(row[3]) if row[3] else None
+                else:
+                    try:
+                        frontmatter = parse_frontmatter(skill_md)
+                    except Exception:
+                        frontmatter = None
+                    raw = json.dumps(frontmatter, default=str) if frontmatter else None
+                    # 经过一次 JSON 往返，保证命中缓存与未命中时返回的数据类型一致
+                    frontmatter = json.loads(raw) if raw else None
+                    changed.append((item,) + key + (raw,))
+
+                entries.append((item, skill_dir, frontmatter))
+
+            candidates = cached if names is None else [d for d in names if d in cached]
+            self._store(changed, [d for d in candidates if d not in seen])
+
+        return entries
+
+    def _store(self, changed, removed):
+        if self._conn is None or not (changed or removed):
+            return
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO skills (dir, mtime_ns, size, inode, frontmatter)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    changed
+                )
+                self._conn.executemany(
+                    "DELETE FROM skills WHERE dir = ?",
+                    [(d,) for d in removed]
+                )
+                # 已删除 skill 的文件 hash 也一并清掉
+                for d in removed:
+                    prefix = os.path.join(self.skills_root, d) + os.sep
+                    self._conn.execute(
+                        "DELETE FROM file_hashes WHERE substr(path, 1, ?) = ?",
+                        (len(prefix), prefix)
+                    )
+        except sqlite3.Error as e:
+            print(f"Warning: failed to update skill index: {e}", file=sys.stderr)
+
+    def get_file_hash(self, path, st):
+        """按 stat 结果查询缓存的 blob hash，未命中返回 None"""
+        key = (st.st_size, st.st_mtime_ns, st.st_ino)
+        with self._lock:
+            pending = self._pending_hashes.get(path)
+            if pending is not None:
+                return pending[3] if pending[:3] == key else None
+            if self._conn is None:
+                return None
+            try:
+                row = self._conn.execute(
+                    "SELECT size, mtime_ns, inode, sha FROM file_hashes WHERE path = ?",
+                    (path,)
+                ).fetchone()
+            except sqlite3.Error:
+                return None
+        if row is not None and tuple(row[:3]) == key:
+            return row[3]
+        return None
+
+    def put_file_hash(self, path, st, sha):
+        """记录文件 hash，攒够一批后再写库"""
+        if self._conn is None:
+            return
+        if time.time() - st.st_mtime_ns / 1e9 < RACY_WINDOW_SECONDS:
+            return
+        with self._lock:
+            self._pending_hashes[path] = (st.st_size, st.st_mtime_ns, st.st_ino, sha)
+            if len(self._pending_hashes) < HASH_FLUSH_THRESHOLD:
+                return
+        self.flush()
+
+    def flush(self):
+        """把待写入的 hash 记录落盘"""
+        with self._lock:
+            if self._conn is None or not self._pending_hashes:
+                return
+            rows = [(p,) + v for p, v in self._pending_hashes.items()]
+            self._pending_hashes = {}
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, inode, sha)"
+                        " VALUES (?, ?, ?, ?, ?)",
+                        rows
+                    )
+            except sqlite3.Error as e:
+                print(f"Warning: failed to update hash cache: {e}", file=sys.stderr)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+@atexit.register
+def _flush_indexes():
+    for index in list(_indexes.values()):
+        index.flush()
+
+
+def get_skill_index(skills_root):
+    """按 skills 根目录复用同一个 SkillIndex 实例"""
+    key = os.path.abspath(skills_root)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = SkillIndex(key)
+            _indexes[key] = index
+        return index
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+skill_txn.py - skill 更新事务（崩溃安全）
+
+更新不再原地逐个写文件，而是：
+1. 在 <skills_root>/.skill-manager/txn/<skill>/stage 下建立 skill 目录的副本
+   （未变化的文件用硬链接，几乎没有开销）
+2. 新文件和新的 SKILL.md 都写入 stage（原子替换，不会改动与线上共享的 inode）
+3. 提交时用 renameat2(RENAME_EXCHANGE) 原子交换两个目录；不支持时退化为两次 rename
+
+stage 是 begin 时的快照。交换之前 sync_from_live() 把这段时间里线上目录中新增、修改
+（包括编辑器以新 inode 保存）和删除的文件同步到 stage，本次更新要写入的文件除外，用户的修改不会丢失。
+同一 skill 同一时间只能有一个事务：<txn>/<skill>.lock 上的 fcntl.flock 排他锁。
+
+journal.json 记录目标 commit 和阶段。进程在任意时刻被杀掉后：
+- 暂存阶段中断：下次更新同一目标 commit 时复用 stage 中已下载且 hash 正确的文件
+- 交换阶段中断：recover_transactions() 根据 stage 目录的 inode 判断交换是否完成并补完
+"""
+
+import os
+import sys
+import json
+import shutil
+import ctypes
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from skill_index import get_state_dir
+
+TXN_DIRNAME = "txn"
+JOURNAL_FILENAME = "journal.json"
+
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+
+
+class TransactionBusy(Exception):
+    """另一个进程正在更新同一个 skill"""
+
+
+def _exchange_dirs(a, b):
+    """原子交换两个路径（Linux renameat2），不支持时返回 False"""
+    try:
+        renameat2 = ctypes.CDLL(None, use_errno=True).renameat2
+    except (OSError, AttributeError):
+        return False
+    renameat2.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    renameat2.restype = ctypes.c_int
+    return renameat2(AT_FDCWD, os.fsencode(a), AT_FDCWD, os.fsencode(b), RENAME_EXCHANGE) == 0
+
+
+def _link_or_copy(src, dst):
+    """copytree 的 copy_function：优先硬链接，不支持时复制"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _write_json_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.journal-')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class SkillTransaction:
+    """单个 skill 目录的更新事务"""
+
+    def __init__(self, skill_dir):
+        self.skill_dir = os.path.abspath(skill_dir)
+        skills_root = os.path.dirname(self.skill_dir)
+        self.txn_dir = os.path.join(get_state_dir(skills_root), TXN_DIRNAME, os.path.basename(self.skill_dir))
+        self.stage_dir = os.path.join(self.txn_dir, "stage")
+        self.journal_path = os.path.join(self.txn_dir, JOURNAL_FILENAME)
+        # 锁文件放在 txn 目录外面：提交后 txn 目录会被删除
+        self.lock_path = self.txn_dir + ".lock"
+        self._lock_fd = None
+
+    def try_lock(self):
+        """获取该 skill 的事务锁（不等待），已被其他进程持有时返回 False；可重复调用"""
+        if self._lock_fd is not None:
+            return True
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+        self._lock_fd = fd
+        return True
+
+    def release(self):
+        """释放事务锁（未持有时什么也不做）"""
+        if self._lock_fd is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        os.close(self._lock_fd)
+        self._lock_fd = None
+
+    def _read_journal(self):
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def begin(self, target_sha):
+        """
+        准备 stage 目录，返回 True 表示复用了之前中断的同一目标事务。
+        目标 commit 不同或 journal 损坏时丢弃旧的 stage 重新开始。
+        先获取事务锁，其他进程正在更新该 skill 时抛出 TransactionBusy；锁在 commit() 或 release() 时释放。
+        """
+        if not self.try_lock():
+            raise TransactionBusy(f"Another update of {self.skill_dir} is in progress")
+        self.recover()
+        journal = self._read_journal()
+        if (journal and journal.get('phase') == 'staging'
+                and journal.get('target_sha') == target_sha and os.path.isdir(self.stage_dir)):
+            return True
+
+        self.abort()
+        os.makedirs(self.txn_dir, exist_ok=True)
+        shutil.copytree(self.skill_dir, self.stage_dir, symlinks=True, copy_function=_link_or_copy)
+        _write_json_atomic(self.journal_path, {
+            'skill_dir': self.skill_dir,
+            'target_sha': target_sha,
+            'phase': 'staging'
+        })
+        return False
+
+    def sync_from_live(self, exclude=()):
+        """
+        把 begin 之后线上目录的变化同步到 stage：新增和修改的文件（inode、大小或 mtime 不同）
+        重新链接或复制，线上已删除的文件从 stage 删除。exclude 中的相对路径（本次更新写入的文件）不动。
+        返回同步的文件数。
+        """
+        exclude = set(p.replace('\\', '/') for p in exclude)
+        live_files = set()
+        synced = 0
+        for root, dirs, files in os.walk(self.skill_dir):
+            rel_root = os.path.relpath(root, self.skill_dir)
+            for name in files + [d for d in dirs if os.path.islink(os.path.join(root, d))]:
+                rel_path = name if rel_root == '.' else os.path.join(rel_root, name)
+                key = rel_path.replace(os.sep, '/')
+                live_files.add(key)
+                if key in exclude:
+                    continue
+                src = os.path.join(root, name)
+                dst = os.path.join(self.stage_dir, rel_path)
+                if self._same_file(src, dst):
+                    continue
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                if os.path.lexists(dst):
+                    if os.path.isdir(dst) and not os.path.islink(dst):
+                        shutil.rmtree(dst)
+                    else:
+                        os.remove(dst)
+                if os.path.islink(src):
+                    os.symlink(os.readlink(src), dst)
+                else:
+                    _link_or_copy(src, dst)
+                synced += 1
+        for root, dirs, files in os.walk(self.stage_dir):
+            rel_root = os.path.relpath(root, self.stage_dir)
+            for name in files:
+                rel_path = name if rel_root == '.' else os.path.join(rel_root, name)
+                key = rel_path.replace(os.sep, '/')
+                if key not in live_files and key not in exclude:
+                    os.remove(os.path.join(root, name))
+                    synced += 1
+        return synced
+
+    @staticmethod
+    def _same_file(src, dst):
+        try:
+            a = os.lstat(src)
+            b = os.lstat(dst)
+        except OSError:
+            return False
+        if os.path.islink(src) or os.path.islink(dst):
+            return os.path.islink(src) and os.path.islink(dst) and os.readlink(src) == os.readlink(dst)
+        if a.st_ino == b.st_ino and a.st_dev == b.st_dev:
+            return True
+        # 不支持硬链接时 stage 中是复制的文件（copy2 保留 mtime）
+        return a.st_size == b.st_size and a.st_mtime_ns == b.st_mtime_ns
+
+    def commit(self):
+        """用 stage 替换线上 skill 目录（调用方应先 sync_from_live），然后释放事务锁"""
+        try:
+            journal = self._read_journal() or {}
+            journal['phase'] = 'swapping'
+            journal['stage_inode'] = os.stat(self.stage_dir).st_ino
+            _write_json_atomic(self.journal_path, journal)
+            self._finish_swap(journal)
+        finally:
+            self.release()
+
+    def _finish_swap(self, journal):
+        stage_inode = journal.get('stage_inode')
+        try:
+            live_inode = os.stat(self.skill_dir).st_ino
+        except OSError:
+            live_inode = None
+
+        if live_inode != stage_inode:
+            if live_inode is None:
+                # 两次 rename 之间中断：线上目录已移走，只差把 stage 移过去
+                os.rename(self.stage_dir, self.skill_dir)
+            elif not _exchange_dirs(self.stage_dir, self.skill_dir):
+                old_dir = os.path.join(self.txn_dir, "old")
+                if os.path.exists(old_dir):
+                    shutil.rmtree(old_dir)
+                os.rename(self.skill_dir, old_dir)
+                os.rename(self.stage_dir, self.skill_dir)
+        # 交换完成，txn 目录里剩下的都是旧版本
+        shutil.rmtree(self.txn_dir, ignore_errors=True)
+
+    def recover(self):
+        """补完中断在交换阶段的事务；返回是否做了恢复"""
+        journal = self._read_journal()
+        if not journal or journal.get('phase') != 'swapping':
+            return False
+        self._finish_swap(journal)
+        return True
+
+    def abort(self):
+        """丢弃 stage（调用方需持有事务锁）"""
+        if os.path.exists(self.txn_dir):
+            shutil.rmtree(self.txn_dir)
+
+
+def recover_transactions(skills_root):
+    """恢复 skills 根目录下所有中断在交换阶段的事务，返回恢复的 skill 目录列表"""
+    txn_root = os.path.join(get_state_dir(skills_root), TXN_DIRNAME)
+    recovered = []
+    if not os.path.isdir(txn_root):
+        return recovered
+    for name in os.listdir(txn_root):
+        if name.endswith(".lock"):
+            continue
+        txn = SkillTransaction(os.path.join(os.path.abspath(skills_root), name))
+        # 正在被其他进程更新的 skill 由那个进程自己完成
+        if not txn.try_lock():
+            continue
+        try:
+            if txn.recover():
+                recovered.append(txn.skill_dir)
+        except OSError as e:
+            print(f"Warning: failed to recover transaction for {name}: {e}", file=sys.stderr)
+        finally:
+            txn.release()
+    return recovered
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+tree_cache.py - 按 commit 缓存解析后的远程文件树
+
+commit SHA 对应的 tree 不会变化，因此可以无条件复用：
+scan_and_check.py、update_skill.py、watch_daemon.py 以及之后每次运行都共用这份磁盘缓存，
+同一 commit 的 tree 只请求一次。
+
+位置: <SKILL_MANAGER_CACHE_DIR>/trees/<owner>/<repo>/<commit_sha>.tree
+格式: zlib 压缩的二进制记录，每条为 path + b'\\0' + 20 字节 blob SHA，按 path 排序，
+      读取后直接得到 RemoteTree，无需再排序
+容量: SKILL_MANAGER_TREE_CACHE_MB（默认 256），超出时按访问时间（mtime）删除最旧的条目
+"""
+
+import os
+import re
+import sys
+import zlib
+import tempfile
+import threading
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from http_cache import get_user_cache_dir
+from remote_tree import RemoteTree
+
+FORMAT_MAGIC = b"SMTREE1\n"
+DEFAULT_MAX_BYTES = int(float(os.getenv("SKILL_MANAGER_TREE_CACHE_MB", "256")) * 1024 * 1024)
+# 淘汰时删到容量的这个比例以下，避免每次写入都触发淘汰
+EVICT_TARGET = 0.8
+# 进程内保留的已解析 tree 数
+MEMORY_ENTRIES = 16
+
+_SHA_RE = re.compile(r'^[0-9a-f]{40}$')
+
+
+def encode_tree(tree):
+    parts = [FORMAT_MAGIC]
+    for path, sha in tree.items():
+        parts.append(path.encode('utf-8', 'surrogateescape') + b'\0' + bytes.fromhex(sha))
+    return zlib.compress(b''.join(parts), 6)
+
+
+def decode_tree(blob):
+    data = zlib.decompress(blob)
+    if not data.startswith(FORMAT_MAGIC):
+        raise ValueError("Unknown tree cache format")
+    paths = []
+    shas = []
+    pos = len(FORMAT_MAGIC)
+    end = len(data)
+    while pos < end:
+        nul = data.index(b'\0', pos)
+        paths.append(data[pos:nul].decode('utf-8', 'surrogateescape'))
+        shas.append(data[nul + 1:nul + 21].hex())
+        pos = nul + 21
+    return RemoteTree.from_sorted(paths, shas)
+
+
+class TreeCache:
+    """(owner, repo, commit_sha) -> RemoteTree 的磁盘缓存，多进程共享（写入是原子替换）"""
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or os.path.join(get_user_cache_dir(), "trees")
+        self.max_bytes = max_bytes
+        self._memory = {}
+        self._lock = threading.Lock()
+        # 缓存目录的总大小：第一次写入时统计一次，之后按本进程的写入累加，
+        # 超过上限时才重新遍历目录（同时计入其他进程写入的条目）
+        self._total = None
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def _path(self, owner, repo, sha):
+        return os.path.join(self.cache_dir, owner, repo, sha + ".tree")
+
+    def get(self, owner, repo, sha):
+        """返回缓存的 RemoteTree，没有时返回 None"""
+        if not _SHA_RE.match(sha or ''):
+            return None
+        key = (owner, repo, sha)
+        with self._lock:
+            tree = self._memory.get(key)
+        if tree is None:
+            path = self._path(owner, repo, sha)
+            try:
+                with open(path, 'rb') as f:
+                    tree = decode_tree(f.read())
+                # mtime 作为最近访问时间，供 LRU 淘汰使用
+                os.utime(path)
+            except (OSError, ValueError, zlib.error):
+                with self._lock:
+                    self.stats['misses'] += 1
+                return None
+            self._remember(key, tree)
+        with self._lock:
+            self.stats['hits'] += 1
+        return tree
+
+    def put(self, owner, repo, sha, tree):
+        """保存 commit 对应的 tree；ref 不是 commit SHA 时不缓存"""
+        if not _SHA_RE.match(sha or ''):
+            return
+        self._remember((owner, repo, sha), tree)
+        path = self._path(owner, repo, sha)
+        data = encode_tree(tree)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                old_size = os.path.getsize(path)
+            except OSError:
+                old_size = 0
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tree-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: failed to write tree cache: {e}", file=sys.stderr)
+            return
+        with self._lock:
+            if self._total is not None:
+                self._total += len(data) - old_size
+            # 还没有统计过（第一次写入）或超过上限时才遍历目录
+            need_scan = self._total is None or self._total > self.max_bytes
+        if need_scan:
+            self.evict()
+
+    def _remember(self, key, tree):
+        with self._lock:
+            self._memory.pop(key, None)
+            self._memory[key] = tree
+            while len(self._memory) > MEMORY_ENTRIES:
+                self._memory.pop(next(iter(self._memory)))
+
+    def _entries(self):
+        entries = []
+        for root, dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.tree'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def evict(self):
+        """统计缓存目录总大小，超过上限时删除最久未访问的条目，返回删除数量"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        if total > self.max_bytes:
+            target = self.max_bytes * EVICT_TARGET
+            for mtime, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    removed += 1
+                except OSError:
+                    pass
+        with self._lock:
+            self._total = total
+        return removed
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_tree_cache():
+    """返回进程内共享的 TreeCache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TreeCache()
+        return _cache
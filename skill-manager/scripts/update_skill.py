@@ -3,18 +3,41 @@ import sys
 import os
 import json
 import base64
-import urllib.request
-import urllib.error
+import argparse
+import hashlib
+import tarfile
+import tempfile
+import time
+import concurrent.futures
 import yaml
 # Ensure we can import from the same directory
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from scan_and_check import scan_skills, check_updates, parse_github_url, get_default_skills_dir, get_latest_commit_sha
+import http_client
+from blob_store import get_blob_store
+from rate_limit import api_request, configure_scheduler, get_scheduler, BudgetExceeded, RateLimitExceeded, PRIORITY_BLOB
+from skill_txn import SkillTransaction, TransactionBusy, recover_transactions
+from git_backend import get_git_backend
+from scan_and_check import (scan_skills, check_updates, parse_github_url, get_default_skills_dir, resolve_head,
+                            set_backend, get_backend, BACKENDS, GITHUB_API_URL, _hash_file_stream)
 
 DEFAULT_SKILLS_DIR = get_default_skills_dir()
 
+# Concurrent blob downloads per skill update
+DEFAULT_DOWNLOAD_WORKERS = 8
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Switch to one streamed tarball when more than this fraction of the skill's files
+# is outdated (and at least ARCHIVE_MIN_FILES files need downloading)
+ARCHIVE_THRESHOLD = 0.5
+ARCHIVE_MIN_FILES = 10
+
+# Current umask, needed to give atomically written files the usual default mode
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
 def get_file_content(github_info, file_path):
     """Fetch file content from GitHub API"""
-    api_url = f"https://api.github.com/repos/{github_info['owner']}/{github_info['repo']}/contents/{file_path}?ref={github_info['branch']}"
+    api_url = f"{GITHUB_API_URL}/repos/{github_info['owner']}/{github_info['repo']}/contents/{file_path}?ref={github_info['branch']}"
     headers = {
         'Accept': 'application/vnd.github.v3+json',
         'User-Agent': 'opencode-skill-manager'
@@ -24,10 +47,9 @@ def get_file_content(github_info, file_path):
         headers['Authorization'] = f'token {token}'
         
     try:
-        req = urllib.request.Request(api_url, headers=headers)
-        with urllib.request.urlopen(req, timeout=20) as response:
+        with api_request('GET', api_url, priority=PRIORITY_BLOB, headers=headers) as response:
             if response.status == 200:
-                data = json.loads(response.read().decode('utf-8'))
+                data = response.json()
                 if 'content' in data:
                     return base64.b64decode(data['content'])
                 else:
@@ -42,7 +64,7 @@ def get_file_content(github_info, file_path):
         return None
 
 def get_blob_content(github_info, sha):
-    api_url = f"https://api.github.com/repos/{github_info['owner']}/{github_info['repo']}/git/blobs/{sha}"
+    api_url = f"{GITHUB_API_URL}/repos/{github_info['owner']}/{github_info['repo']}/git/blobs/{sha}"
     headers = {
         'Accept': 'application/vnd.github.v3+json',
         'User-Agent': 'opencode-skill-manager'
@@ -52,75 +74,348 @@ def get_blob_content(github_info, sha):
         headers['Authorization'] = f'token {token}'
         
     try:
-        req = urllib.request.Request(api_url, headers=headers)
-        with urllib.request.urlopen(req, timeout=20) as response:
+        with api_request('GET', api_url, priority=PRIORITY_BLOB, headers=headers) as response:
             if response.status == 200:
-                data = json.loads(response.read().decode('utf-8'))
+                data = response.json()
                 content = base64.b64decode(data['content'])
                 return content
             return None
     except Exception:
         return None
 
-def update_skill_files(skill, updates_needed):
+def _new_file_mode(dest_path):
+    """Mode for a file replacing dest_path: keep the existing mode, else the umask default"""
+    try:
+        return os.stat(dest_path).st_mode & 0o7777
+    except OSError:
+        return 0o666 & ~_UMASK
+
+class BlobHashMismatch(Exception):
+    """Downloaded content does not match the expected blob SHA"""
+
+def write_file_atomic(dest_path, chunks, sha=None, size=None):
+    """
+    Write an iterable of byte chunks to a temp file next to dest_path, then rename it into place.
+    With `sha`, the content is checked against that git blob SHA before the rename: the digest is
+    computed while writing when `size` is known (otherwise the temp file is hashed once), and on a
+    mismatch the temp file is removed, dest_path is left untouched and BlobHashMismatch is raised.
+    Returns the number of bytes written.
+    """
+    dest_dir = os.path.dirname(dest_path)
+    os.makedirs(dest_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, prefix='.download-')
+    # Git blob header: "blob <size>\0"
+    digest = hashlib.sha1(f"blob {size}\0".encode('utf-8')) if sha and size is not None else None
+    written = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                written += len(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+        if sha:
+            if digest is not None:
+                actual = digest.hexdigest() if written == size else None
+            else:
+                actual = _hash_file_stream(tmp_path)
+            if actual != sha:
+                raise BlobHashMismatch(f"Blob hash mismatch for {dest_path}")
+        os.chmod(tmp_path, _new_file_mode(dest_path))
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return written
+
+def _content_length(response):
+    try:
+        return int(response.headers.get('Content-Length'))
+    except (TypeError, ValueError):
+        return None
+
+def download_blob_to_file(github_info, sha, dest_path):
+    """
+    Stream a blob straight to dest_path without holding it in memory.
+    Uses the raw media type so the body is the file itself (no base64 to decode);
+    the body is verified against the blob SHA before it replaces dest_path.
+    Returns bytes written or None.
+    """
+    api_url = f"{GITHUB_API_URL}/repos/{github_info['owner']}/{github_info['repo']}/git/blobs/{sha}"
+    headers = {
+        'Accept': 'application/vnd.github.raw',
+        'User-Agent': 'opencode-skill-manager'
+    }
+    token = os.getenv('GITHUB_TOKEN')
+    if token:
+        headers['Authorization'] = f'token {token}'
+
+    try:
+        with api_request('GET', api_url, priority=PRIORITY_BLOB, headers=headers, stream=True) as response:
+            if response.status != 200:
+                return None
+            if 'json' in (response.headers.get('Content-Type') or ''):
+                # Server ignored the raw media type: fall back to the base64 JSON payload
+                content = base64.b64decode(response.json()['content'])
+                return write_file_atomic(dest_path, [content], sha=sha, size=len(content))
+            return write_file_atomic(dest_path, response.iter_content(DOWNLOAD_CHUNK_SIZE),
+                                     sha=sha, size=_content_length(response))
+    except BlobHashMismatch as e:
+        print(str(e), file=sys.stderr)
+        return None
+    except Exception as e:
+        print(f"Error downloading blob {sha}: {e}", file=sys.stderr)
+        return None
+
+def download_blob_via_git(github_info, sha, dest_path):
+    """Stream a blob out of the local partial clone (fetching it on demand). Returns bytes written or None."""
+    backend = get_git_backend()
+    owner, repo = github_info['owner'], github_info['repo']
+    try:
+        return write_file_atomic(dest_path, backend.iter_blob(owner, repo, sha),
+                                 sha=sha, size=backend.blob_size(owner, repo, sha))
+    except BlobHashMismatch as e:
+        print(str(e), file=sys.stderr)
+        return None
+    except Exception as e:
+        print(f"Error reading blob {sha} from git: {e}", file=sys.stderr)
+        return None
+
+def download_blob(github_info, sha, dest_path):
+    """Download a blob through the selected backend"""
+    if get_backend() == 'git':
+        return download_blob_via_git(github_info, sha, dest_path)
+    return download_blob_to_file(github_info, sha, dest_path)
+
+def prefetch_blobs(store, github_info, shas):
+    """
+    With the git backend, fetch every blob the store is missing in one batched
+    `git fetch` instead of one lazy fetch per `git cat-file`. No-op for REST.
+    """
+    if get_backend() != 'git':
+        return
+    missing = [sha for sha in shas if sha and not store.has(sha)]
+    if not missing:
+        return
+    try:
+        get_git_backend().prefetch_blobs(github_info['owner'], github_info['repo'], missing)
+    except Exception as e:
+        # Not fatal: cat-file still fetches missing blobs one by one
+        print(f"Warning: batched blob fetch failed: {e}", file=sys.stderr)
+
+def _dest_dir(skill):
+    """Where a skill's files are written: its transaction staging dir while one is open"""
+    return skill.get('_stage_dir') or skill['dir']
+
+def _store_for(skill):
+    """The shared blob store lives under the skills root (the skill dir's parent)"""
+    return get_blob_store(os.path.dirname(os.path.abspath(skill['dir'])))
+
+def fetch_blob_via_store(store, github_info, sha, dest_path):
+    """
+    Put blob `sha` at dest_path, downloading it into the shared blob store only
+    when the store does not have it yet. When the store is not populated (see
+    BlobStore.populate) a missing blob is downloaded straight to dest_path.
+    Returns (downloaded_bytes, source) with source 'store' or 'network';
+    downloaded_bytes is None on failure.
+    """
+    downloaded = 0
+    source = 'store'
+    if not store.has(sha):
+        source = 'network'
+        if not store.populate:
+            return download_blob(github_info, sha, dest_path), source
+        downloaded = download_blob(github_info, sha, store.prepare(sha))
+        if downloaded is None:
+            return None, source
+        # download_blob checked the SHA before renaming the file into the store
+        store.remember(sha)
+    try:
+        store.materialize(sha, dest_path)
+    except OSError as e:
+        print(f"Failed to write {dest_path}: {e}", file=sys.stderr)
+        return None, source
+    return downloaded, source
+
+def _download_one(skill, github_info, base_path, item):
+    """Download a single file; returns a per-file report dict"""
+    rel_path = item['path']
+    print(f"Downloading {rel_path}...", file=sys.stderr)
+    started = time.monotonic()
+    local_abs_path = os.path.join(_dest_dir(skill), rel_path)
+
+    # Use blob content if we have the SHA (more reliable/efficient), reusing the shared store
+    remote_hash = item.get('remote_hash')
+    size = None
+    source = 'network'
+    if remote_hash:
+        size, source = fetch_blob_via_store(_store_for(skill), github_info, remote_hash, local_abs_path)
+    else:
+        # Construct full remote path
+        remote_path = f"{base_path}/{rel_path}" if base_path else rel_path
+        content = get_file_content(github_info, remote_path)
+        if content is not None:
+            try:
+                size = write_file_atomic(local_abs_path, [content])
+            except Exception as e:
+                print(f"Failed to write {rel_path}: {e}", file=sys.stderr)
+
+    if size is None:
+        print(f"Failed to download content for {rel_path}", file=sys.stderr)
+    return {
+        'path': rel_path,
+        'ok': size is not None,
+        'source': source,
+        'bytes': size or 0,
+        'seconds': round(time.monotonic() - started, 4)
+    }
+
+def download_archive_files(github_info, ref, skill_dir, base_path, items, store=None):
+    """
+    Stream the repository tarball at `ref` and extract only the requested files.
+    The archive is decompressed on the fly and never written to disk; extracted
+    files are also added to `store` when given.
+    Returns (reports, leftover_items) - leftovers were not found in the archive.
+    """
+    api_url = f"{GITHUB_API_URL}/repos/{github_info['owner']}/{github_info['repo']}/tarball/{ref}"
+    headers = {
+        'Accept': 'application/vnd.github.v3+json',
+        'User-Agent': 'opencode-skill-manager'
+    }
+    token = os.getenv('GITHUB_TOKEN')
+    if token:
+        headers['Authorization'] = f'token {token}'
+
+    wanted = {}
+    for item in items:
+        remote_path = f"{base_path}/{item['path']}" if base_path else item['path']
+        wanted[remote_path.replace('\\', '/')] = item
+
+    reports = []
+    try:
+        with api_request('GET', api_url, priority=PRIORITY_BLOB, headers=headers, stream=True) as response:
+            with tarfile.open(fileobj=response, mode='r|gz') as archive:
+                for member in archive:
+                    if not wanted:
+                        break
+                    # Every entry is prefixed with "<owner>-<repo>-<sha>/"
+                    name = member.name.split('/', 1)[1] if '/' in member.name else ''
+                    if not member.isfile() or name not in wanted:
+                        continue
+                    item = wanted.pop(name)
+                    started = time.monotonic()
+                    print(f"Extracting {item['path']}...", file=sys.stderr)
+                    dest_path = os.path.join(skill_dir, item['path'])
+                    source = archive.extractfile(member)
+                    try:
+                        size = write_file_atomic(dest_path, iter(lambda: source.read(DOWNLOAD_CHUNK_SIZE), b''),
+                                                 sha=item.get('remote_hash'), size=member.size)
+                        ok = True
+                    except BlobHashMismatch:
+                        # dest_path is left as it was; the file is retried as a blob download
+                        print(f"Blob hash mismatch for {item['path']}", file=sys.stderr)
+                        size, ok = 0, False
+                    if ok and store is not None and item.get('remote_hash'):
+                        store.add_file(dest_path, item['remote_hash'])
+                    reports.append({
+                        'path': item['path'],
+                        'ok': ok,
+                        'source': 'archive',
+                        'bytes': size if ok else 0,
+                        'seconds': round(time.monotonic() - started, 4)
+                    })
+    except Exception as e:
+        print(f"Archive download failed, falling back to blobs: {e}", file=sys.stderr)
+
+    done = set(r['path'] for r in reports if r['ok'])
+    leftovers = [item for item in items if item['path'] not in done]
+    return reports, leftovers
+
+def should_use_archive(updates_needed, total_files, threshold=ARCHIVE_THRESHOLD):
+    """Use the archive path when enough of the skill is outdated to beat per-file requests"""
+    if threshold is None or threshold > 1 or len(updates_needed) < ARCHIVE_MIN_FILES:
+        return False
+    return len(updates_needed) / max(1, total_files) > threshold
+
+def update_skill_files(skill, updates_needed, workers=DEFAULT_DOWNLOAD_WORKERS, use_archive=False):
     """
     updates_needed: list of dict {'path': 'rel/path', 'remote_hash': 'sha'}
+
+    Downloads run concurrently (at most `workers` at a time) and stream to disk;
+    blobs already in the shared content-addressed store are not downloaded again.
+    With use_archive, the files are first extracted from one streamed tarball of the
+    target commit; anything the archive could not provide falls back to blobs.
+    Returns (success_count, fail_count, stats) where stats holds per-file latency
+    and the overall throughput.
     """
+    started = time.monotonic()
     github_info = parse_github_url(skill['github_url'])
     if not github_info:
         print(f"Invalid GitHub URL: {skill['github_url']}", file=sys.stderr)
-        return 0, len(updates_needed)
+        return 0, len(updates_needed), {'files': [], 'bytes': 0, 'seconds': 0, 'bytes_per_second': 0}
 
     base_path = github_info['path'].strip('/')
+    reports = []
+    pending = list(updates_needed)
+    method = 'blobs'
+
+    if get_backend() == 'git':
+        # A batched git fetch already brings all blobs in one pack
+        method = 'git'
+        use_archive = False
+        prefetch_blobs(_store_for(skill), github_info, [item.get('remote_hash') for item in pending])
+
+    if use_archive and pending:
+        method = 'archive'
+        ref = skill.get('remote_head') or github_info['branch']
+        archive_reports, pending = download_archive_files(
+            github_info, ref, _dest_dir(skill), base_path, pending, store=_store_for(skill)
+        )
+        reports.extend(r for r in archive_reports if r['ok'])
     
-    success_count = 0
-    fail_count = 0
+    if pending:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            reports.extend(executor.map(
+                lambda item: _download_one(skill, github_info, base_path, item),
+                pending
+            ))
     
-    for item in updates_needed:
-        rel_path = item['path']
-        print(f"Downloading {rel_path}...", file=sys.stderr)
-        
-        # Construct full remote path
-        if base_path:
-            remote_path = f"{base_path}/{rel_path}"
-        else:
-            remote_path = rel_path
-            
-        # Use blob content if we have the SHA (more reliable/efficient)
-        remote_hash = item.get('remote_hash')
-        if remote_hash:
-             content = get_blob_content(github_info, remote_hash)
-        else:
-             content = get_file_content(github_info, remote_path)
-        
-        if content is not None:
-            local_abs_path = os.path.join(skill['dir'], rel_path)
-            os.makedirs(os.path.dirname(local_abs_path), exist_ok=True)
-            try:
-                with open(local_abs_path, 'wb') as f:
-                    f.write(content)
-                success_count += 1
-            except Exception as e:
-                print(f"Failed to write {rel_path}: {e}", file=sys.stderr)
-                fail_count += 1
-        else:
-            print(f"Failed to download content for {rel_path}", file=sys.stderr)
-            fail_count += 1
-            
-    return success_count, fail_count
+    success_count = sum(1 for r in reports if r['ok'])
+    fail_count = len(reports) - success_count
+    elapsed = time.monotonic() - started
+    total_bytes = sum(r['bytes'] for r in reports)
+    stats = {
+        'method': method,
+        'files': reports,
+        'bytes': total_bytes,
+        'seconds': round(elapsed, 4),
+        'bytes_per_second': round(total_bytes / elapsed) if elapsed > 0 else 0
+    }
+    return success_count, fail_count, stats
 
-def update_skill_metadata(skill):
-    """Update SKILL.md with the latest commit hash"""
+def update_skill_metadata(skill, skill_dir=None, latest_sha=None):
+    """
+    Update SKILL.md in skill_dir (default: the skill's dir) with the latest commit hash.
+    The file is replaced atomically: inside a transaction it may still share an inode
+    with the live skill. github_url is restored if the new SKILL.md came from upstream
+    without it, so the skill stays managed.
+    """
     github_info = parse_github_url(skill['github_url'])
     if not github_info:
         return False
         
-    latest_sha = get_latest_commit_sha(github_info['owner'], github_info['repo'], github_info['branch'])
+    # Prefer the head recorded by check_updates: it is the commit the files were diffed against
+    try:
+        latest_sha = latest_sha or skill.get('remote_head') or resolve_head(github_info['owner'], github_info['repo'], github_info['branch'])
+    except (BudgetExceeded, RateLimitExceeded) as e:
+        print(f"Warning: Could not fetch latest commit SHA to update SKILL.md: {e}", file=sys.stderr)
+        return False
     if not latest_sha:
         print("Warning: Could not fetch latest commit SHA to update SKILL.md", file=sys.stderr)
         return False
         
-    skill_md_path = os.path.join(skill['dir'], 'SKILL.md')
+    skill_md_path = os.path.join(skill_dir or skill['dir'], 'SKILL.md')
     if not os.path.exists(skill_md_path):
         return False
         
@@ -143,12 +438,12 @@ def update_skill_metadata(skill):
                 if 'github_hash:' in frontmatter_raw:
                     new_frontmatter = re.sub(r'github_hash:.*', f'github_hash: {latest_sha}', frontmatter_raw)
                 else:
-                    new_frontmatter = frontmatter_raw + f'\ngithub_hash: {latest_sha}'
+                    new_frontmatter = frontmatter_raw.rstrip('\n') + f'\ngithub_hash: {latest_sha}\n'
+                if 'github_url:' not in new_frontmatter:
+                    new_frontmatter = new_frontmatter.rstrip('\n') + f'\ngithub_url: {skill["github_url"]}\n'
                 
                 new_content = '---' + new_frontmatter + '---' + '---'.join(parts[2:])
-                
-                with open(skill_md_path, 'w', encoding='utf-8') as f:
-                    f.write(new_content)
+                write_file_atomic(skill_md_path, [new_content.encode('utf-8')])
                 return True
             except Exception as e:
                 print(f"Error parsing frontmatter: {e}", file=sys.stderr)
@@ -158,16 +453,270 @@ def update_skill_metadata(skill):
         return False
     return False
 
+def _is_staged(stage_path, remote_hash):
+    """True when an interrupted run already left the expected blob at stage_path"""
+    if not remote_hash or not os.path.isfile(stage_path):
+        # Never staged (e.g. a new file whose download failed), or not a regular file
+        return False
+    try:
+        return _hash_file_stream(stage_path) == remote_hash
+    except OSError:
+        return False
+
+def begin_skill_transaction(skill, files_to_update):
+    """
+    Open (or resume) the update transaction of a checked skill: later downloads go to
+    its staging dir. Files an interrupted run already staged for the same target
+    commit are dropped from files_to_update.
+    Raises TransactionBusy if another process is updating the same skill.
+    Returns (transaction, target_sha, remaining_files, resumed_count).
+    """
+    github_info = parse_github_url(skill['github_url'])
+    target_sha = skill.get('remote_head')
+    if not target_sha and github_info:
+        target_sha = resolve_head(github_info['owner'], github_info['repo'], github_info['branch'])
+
+    txn = SkillTransaction(skill['dir'])
+    resumed = txn.begin(target_sha)
+    skill['_stage_dir'] = txn.stage_dir
+
+    remaining = files_to_update
+    if resumed:
+        remaining = [
+            item for item in files_to_update
+            if not _is_staged(os.path.join(txn.stage_dir, item['path']), item.get('remote_hash'))
+        ]
+        print(f"Resuming interrupted update: {len(files_to_update) - len(remaining)} files already staged", file=sys.stderr)
+    return txn, target_sha, remaining, len(files_to_update) - len(remaining)
+
+def commit_skill_transaction(skill, txn, target_sha, files_to_update):
+    """
+    Swap the staged skill in. Files the user added, edited or deleted in the live skill
+    since the stage was taken are carried over first (except the files this update
+    writes), then the new metadata goes into the staging dir. Returns True on success.
+    The transaction lock is released either way.
+    """
+    try:
+        txn.sync_from_live(exclude=[item['path'] for item in files_to_update])
+        if not update_skill_metadata(skill, skill_dir=txn.stage_dir, latest_sha=target_sha):
+            print("Warning: SKILL.md metadata not updated", file=sys.stderr)
+        txn.commit()
+        return True
+    except OSError as e:
+        print(f"Failed to commit update of {skill['dir']}: {e}", file=sys.stderr)
+        return False
+    finally:
+        txn.release()
+        skill.pop('_stage_dir', None)
+
+def files_needing_update(skill):
+    """Files of a checked skill that should be downloaded"""
+    files_to_update = []
+    for path, info in skill.get('file_status', {}).items():
+        # Update if outdated, and add files that are new upstream ('missing_local').
+        # If 'missing_remote', user has local file not in remote -> Keep it (don't delete).
+        if info['status'] in ('outdated', 'missing_local'):
+            files_to_update.append({'path': path, 'remote_hash': info['remote_hash']})
+    return files_to_update
+
+def build_update_plan(skills, files=None):
+    """
+    Build one download plan across all outdated skills.
+    Files are grouped by remote blob SHA so identical content shared by several
+    skills (e.g. subdirectories of the same monorepo) is downloaded only once.
+    files: optional {skill_dir: [items]} overriding files_needing_update (e.g. after
+    dropping files a resumed transaction already staged).
+
+    Returns {sha: {'github_info': ..., 'targets': [(skill, rel_path), ...]}}
+    """
+    plan = {}
+    for skill in skills:
+        github_info = parse_github_url(skill['github_url'])
+        if not github_info:
+            continue
+        items = files[skill['dir']] if files is not None and skill['dir'] in files else files_needing_update(skill)
+        for item in items:
+            entry = plan.setdefault(item['remote_hash'], {'github_info': github_info, 'targets': []})
+            entry['targets'].append((skill, item['path']))
+    return plan
+
+def _execute_plan_entry(sha, entry):
+    """Fetch one blob once (from the shared store or the network), then place it at every destination"""
+    started = time.monotonic()
+    targets = entry['targets']
+    print(f"Fetching {sha[:8]} -> {len(targets)} file(s)...", file=sys.stderr)
+
+    store = _store_for(targets[0][0])
+    first_skill, first_path = targets[0]
+    first_dest = os.path.join(_dest_dir(first_skill), first_path)
+    size, source = fetch_blob_via_store(store, entry['github_info'], sha, first_dest)
+    results = [(first_skill, first_path, size is not None)]
+    for skill, rel_path in targets[1:]:
+        ok = False
+        if size is not None:
+            try:
+                skill_store = _store_for(skill)
+                dest_path = os.path.join(_dest_dir(skill), rel_path)
+                if skill_store.populate:
+                    skill_store.add_file(first_dest, sha)
+                    skill_store.materialize(sha, dest_path)
+                else:
+                    skill_store.materialize(sha, dest_path, src_path=first_dest)
+                ok = True
+            except Exception as e:
+                print(f"Failed to write {rel_path}: {e}", file=sys.stderr)
+        results.append((skill, rel_path, ok))
+
+    report = {
+        'sha': sha,
+        'ok': size is not None,
+        'source': source,
+        'bytes': size or 0,
+        'destinations': len(targets),
+        'seconds': round(time.monotonic() - started, 4)
+    }
+    return report, results
+
+def execute_update_plan(plan, workers=DEFAULT_DOWNLOAD_WORKERS):
+    """
+    Run a plan from build_update_plan with at most `workers` downloads in flight overall.
+    Returns ({skill_dir: [success, fail]}, stats)
+    """
+    started = time.monotonic()
+    counts = {}
+    reports = []
+
+    by_repo = {}
+    for sha, entry in plan.items():
+        info = entry['github_info']
+        by_repo.setdefault((info['owner'], info['repo']), (entry, []))[1].append(sha)
+    for entry, shas in by_repo.values():
+        prefetch_blobs(_store_for(entry['targets'][0][0]), entry['github_info'], shas)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for report, results in executor.map(lambda kv: _execute_plan_entry(*kv), plan.items()):
+            reports.append(report)
+            for skill, rel_path, ok in results:
+                skill_counts = counts.setdefault(skill['dir'], [0, 0])
+                skill_counts[0 if ok else 1] += 1
+
+    elapsed = time.monotonic() - started
+    total_bytes = sum(r['bytes'] for r in reports)
+    stats = {
+        'method': 'plan',
+        'blobs': reports,
+        'bytes': total_bytes,
+        'seconds': round(elapsed, 4),
+        'bytes_per_second': round(total_bytes / elapsed) if elapsed > 0 else 0
+    }
+    return counts, stats
+
+def update_all(skills_dir, workers=DEFAULT_DOWNLOAD_WORKERS):
+    """
+    Update every outdated skill with one scan, one grouped check and one global download plan.
+    Each skill is staged in its own transaction and only swapped in when all its files arrived.
+    """
+    recover_transactions(skills_dir)
+    all_skills = scan_skills(skills_dir, hash_files=False)
+    print(f"Checking updates for {len(all_skills)} skills...", file=sys.stderr)
+    checked = check_updates(all_skills)
+
+    transactions = {}
+    for skill in checked:
+        if skill.get('status') != 'outdated':
+            continue
+        try:
+            txn, target_sha, remaining, resumed = begin_skill_transaction(skill, files_needing_update(skill))
+        except (TransactionBusy, BudgetExceeded, RateLimitExceeded) as e:
+            skill['status'] = 'error'
+            skill['message'] = str(e)
+            continue
+        transactions[skill['dir']] = (txn, target_sha, remaining, resumed)
+    outdated = [s for s in checked if s.get('status') == 'outdated']
+    plan = build_update_plan(outdated, files={d: t[2] for d, t in transactions.items()})
+    file_count = sum(len(entry['targets']) for entry in plan.values())
+    print(f"Updating {file_count} files ({len(plan)} unique blobs) across {len(outdated)} skills...", file=sys.stderr)
+    counts, download_stats = execute_update_plan(plan, workers=workers)
+
+    skill_results = []
+    for skill in checked:
+        if skill.get('status') != 'outdated':
+            skill_results.append({
+                "name": skill['name'],
+                "status": "up_to_date" if skill.get('status') == 'current' else skill.get('status'),
+                "message": skill.get('message')
+            })
+            continue
+        txn, target_sha, _, resumed = transactions[skill['dir']]
+        success, fail = counts.get(skill['dir'], (0, 0))
+        success += resumed
+        # A skill with failed files keeps its staging dir so the next run resumes it
+        committed = fail == 0 and commit_skill_transaction(skill, txn, target_sha, files_needing_update(skill))
+        txn.release()
+        skill.pop('_stage_dir', None)
+        skill_results.append({
+            "name": skill['name'],
+            "status": "updated" if committed else "partial_update_failed",
+            "updated_files": success + fail,
+            "success": success,
+            "failed": fail,
+            "resumed": resumed,
+            "committed": committed
+        })
+
+    failed = any(r['status'] in ('partial_update_failed', 'error') for r in skill_results)
+    return {
+        "status": "partial_update_failed" if failed else ("updated" if outdated else "up_to_date"),
+        "skills": skill_results,
+        "plan": {"files": file_count, "unique_blobs": len(plan)},
+        "download": download_stats,
+        "connections": http_client.get_stats(),
+        "api_calls": get_scheduler().stats()
+    }
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Update a GitHub-based skill to the upstream HEAD")
+    parser.add_argument("skill_name", nargs="?")
+    parser.add_argument("skills_dir", nargs="?", default=DEFAULT_SKILLS_DIR)
+    parser.add_argument("--all", action="store_true",
+                        help="Update every outdated skill with one shared download plan")
+    parser.add_argument("--budget", type=int, default=None,
+                        help="Maximum number of GitHub API calls this run may spend")
+    parser.add_argument("--workers", type=int, default=DEFAULT_DOWNLOAD_WORKERS,
+                        help=f"Concurrent file downloads (default {DEFAULT_DOWNLOAD_WORKERS})")
+    parser.add_argument("--archive-threshold", type=float, default=ARCHIVE_THRESHOLD,
+                        help="Outdated fraction above which one tarball is streamed instead of "
+                             f"per-file blobs (default {ARCHIVE_THRESHOLD}; >1 disables)")
+    parser.add_argument("--backend", choices=BACKENDS, default=get_backend(),
+                        help=f"Remote data backend: GitHub REST API or a local blobless git clone "
+                             f"(default {get_backend()}, see SKILL_MANAGER_BACKEND)")
+    return parser.parse_args(argv)
+
 def main():
-    if len(sys.argv) < 2:
-        print(json.dumps({"error": "Usage: update_skill.py <skill_name> [skills_dir]"}))
+    args = parse_args(sys.argv[1:])
+    configure_scheduler(budget=args.budget)
+    set_backend(args.backend)
+
+    if args.all:
+        # With --all the only positional argument is the skills directory
+        skills_dir = args.skill_name or args.skills_dir
+        result = update_all(skills_dir, workers=args.workers)
+        print(json.dumps(result, indent=2))
+        sys.exit(1 if result['status'] == 'partial_update_failed' else 0)
+
+    if not args.skill_name:
+        print(json.dumps({"error": "Usage: update_skill.py <skill_name> [skills_dir] [--budget N] [--workers N] [--archive-threshold F] [--backend rest|git]"
+                                   " | update_skill.py --all [skills_dir] [--budget N] [--workers N]"}))
         sys.exit(1)
         
-    target_skill_name = sys.argv[1]
-    skills_dir = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_SKILLS_DIR
+    target_skill_name = args.skill_name
+    skills_dir = args.skills_dir
     
+    # 0. Finish transactions an interrupted run left mid-swap
+    recover_transactions(skills_dir)
+
     # 1. Scan
-    all_skills = scan_skills(skills_dir)
+    all_skills = scan_skills(skills_dir, hash_files=False)
     skill = next((s for s in all_skills if s['name'] == target_skill_name), None)
     
     if not skill:
@@ -196,16 +745,8 @@ def main():
         sys.exit(1)
         
     # 3. Prepare Updates
-    files_to_update = []
+    files_to_update = files_needing_update(skill_status)
     file_status = skill_status.get('file_status', {})
-    
-    for path, info in file_status.items():
-        # Only update if outdated. 
-        # If 'missing_remote', user has local file not in remote -> Keep it (don't delete).
-        # If 'missing_local', well, scan_and_check doesn't detect this yet (as discussed), 
-        # but if it did, we would want to add it.
-        if info['status'] == 'outdated':
-            files_to_update.append({'path': path, 'remote_hash': info['remote_hash']})
             
     if not files_to_update:
         print(json.dumps({
@@ -214,20 +755,37 @@ def main():
         }))
         sys.exit(0)
         
-    # 4. Update
-    print(f"Updating {len(files_to_update)} files...", file=sys.stderr)
-    success, fail = update_skill_files(skill, files_to_update)
+    # 4. Update into a staging copy of the skill (resuming an interrupted run if any)
+    try:
+        txn, target_sha, remaining, resumed = begin_skill_transaction(skill, files_to_update)
+    except (TransactionBusy, BudgetExceeded, RateLimitExceeded) as e:
+        print(json.dumps({"status": "error", "message": str(e)}))
+        sys.exit(1)
+    print(f"Updating {len(remaining)} files...", file=sys.stderr)
+    use_archive = should_use_archive(remaining, len(file_status), args.archive_threshold)
+    success, fail, download_stats = update_skill_files(
+        skill, remaining, workers=args.workers, use_archive=use_archive
+    )
+    success += resumed
     
-    # 5. Update Metadata (github_hash)
-    if success > 0:
+    # 5. Update Metadata (github_hash) and swap the staged skill in.
+    # On failure the staging dir is kept and the next run only fetches what is missing.
+    committed = False
+    if fail == 0:
         print("Updating skill metadata...", file=sys.stderr)
-        update_skill_metadata(skill)
+        committed = commit_skill_transaction(skill, txn, target_sha, files_to_update)
+    txn.release()
     
     result = {
-        "status": "updated" if fail == 0 else "partial_update_failed",
+        "status": "updated" if committed else "partial_update_failed",
         "updated_files": len(files_to_update),
         "success": success,
-        "failed": fail
+        "failed": fail,
+        "resumed": resumed,
+        "committed": committed,
+        "download": download_stats,
+        "connections": http_client.get_stats(),
+        "api_calls": get_scheduler().stats()
     }
     
     print(json.dumps(result, indent=2))
@@ -0,0 +1,638 @@
+#!/usr/bin/env python3
+"""
+watch_daemon.py - 常驻进程，持续检测 skill 更新
+
+Usage:
+    python watch_daemon.py [skills_dir] [--socket PATH] [--min-interval S] [--max-interval S]
+                           [--local-interval S] [--full] [--backend rest|git]
+    python watch_daemon.py [skills_dir] --status    # 查询正在运行的守护进程
+    python watch_daemon.py [skills_dir] --refresh   # 让守护进程立即轮询所有上游仓库
+
+相比 cron 定时运行 scan_and_check.py：
+- skill 列表、各仓库的 HEAD 和 remote tree 常驻内存
+- 本地变化通过 inotify 感知（ctypes 调用，不可用时退化为每 --local-interval 秒重新扫描），
+  只重新评估变化的 skill，不访问网络
+- 上游 HEAD 按仓库单独计时：HEAD 没变时间隔翻倍（直到 --max-interval），变化后回到 --min-interval；
+  同时到期的仓库一起解析 HEAD（有 token 时合并为 GraphQL 批量请求，否则并发请求），
+  只有 HEAD 变化的仓库才拉取 tree
+- 当前状态通过 Unix socket 以 JSON 提供（格式同 scan_and_check.py 的输出，另有 daemon 字段），
+  响应是预先序列化好的，查询只需几毫秒
+
+协议: 连接 socket，发送一行命令 (status / refresh)，读取 JSON 直到连接关闭。
+默认 socket: <skills_dir>/.skill-manager/watch.sock
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import signal
+import socket
+import struct
+import ctypes
+import asyncio
+import argparse
+import selectors
+import threading
+import concurrent.futures
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from skill_index import get_state_dir, get_skill_index
+from scan_and_check import (scan_skills, group_skills_by_repo, evaluate_skill_update, resolve_repo_heads_async,
+                            list_local_files, hash_file_batch, fetch_remote_tree, fetch_base_tree,
+                            set_backend, get_backend, get_default_skills_dir, BACKENDS)
+
+DEFAULT_MIN_INTERVAL = 60
+DEFAULT_MAX_INTERVAL = 3600
+DEFAULT_LOCAL_INTERVAL = 5
+# HEAD 未变化时轮询间隔的增长倍数
+BACKOFF_FACTOR = 2
+# 合并短时间内的多个文件事件（秒）
+DEBOUNCE_SECONDS = 0.5
+SOCKET_FILENAME = "watch.sock"
+# 轮询线程同时进行的 HEAD / tree 请求数
+POLL_WORKERS = 8
+CLIENT_TIMEOUT = 2
+
+# inotify 常量 (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """用 ctypes 调用 inotify，监视 skills 根目录及各 skill 目录树"""
+
+    def __init__(self, skills_root):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.fd = fd
+        self.skills_root = os.path.abspath(skills_root)
+        self._paths = {}
+        self.add(self.skills_root)
+
+    def add(self, path):
+        wd = self._add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd >= 0:
+            self._paths[wd] = path
+
+    def add_tree(self, path):
+        """监视目录及其所有子目录"""
+        for root, dirs, files in os.walk(path):
+            self.add(root)
+
+    def watch_skills(self):
+        """为所有 skill 目录建立监视（已监视的目录重复添加没有副作用）"""
+        for item in os.listdir(self.skills_root):
+            path = os.path.join(self.skills_root, item)
+            if not item.startswith('.') and os.path.isdir(path):
+                self.add_tree(path)
+
+    def read(self):
+        """
+        读取待处理事件，返回受影响的 skill 目录名集合。
+        队列溢出时返回 None，调用方需要全量重新扫描。
+        """
+        affected = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'surrogateescape')
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                base = self._paths.get(wd)
+                if mask & IN_IGNORED:
+                    self._paths.pop(wd, None)
+                    continue
+                if base is None:
+                    continue
+                path = os.path.join(base, name) if name else base
+                rel = os.path.relpath(path, self.skills_root)
+                top = rel.split(os.sep, 1)[0]
+                if top in ('.', '..') or top.startswith('.'):
+                    continue
+                affected.add(top)
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_tree(path)
+        return affected
+
+    def close(self):
+        os.close(self.fd)
+
+
+class WatchDaemon:
+    """持有内存状态：skill 列表、仓库 HEAD / tree 缓存、检查结果"""
+
+    def __init__(self, skills_root, socket_path, min_interval=DEFAULT_MIN_INTERVAL,
+                 max_interval=DEFAULT_MAX_INTERVAL, local_interval=DEFAULT_LOCAL_INTERVAL,
+                 use_head_shortcut=True):
+        self.skills_root = os.path.abspath(skills_root)
+        self.socket_path = socket_path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.local_interval = local_interval
+        self.use_head_shortcut = use_head_shortcut
+        self.started_at = time.time()
+
+        self.skills = {}    # skill dir -> 最近一次评估后的 skill dict
+        self.repos = {}     # (owner, repo, branch) -> 轮询状态与 tree 缓存
+        self.watcher = None
+        self.stats = {'rescans': 0, 'local_events': 0, 'polls': 0, 'head_changes': 0, 'tree_fetches': 0}
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._snapshot = b'{}'
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=POLL_WORKERS,
+                                                               thread_name_prefix="upstream")
+
+    # ---- 本地状态 ----
+
+    def rescan(self, names=None):
+        """
+        重新扫描 skills（SKILL.md 与文件 hash 都走持久化缓存，未变化的不会重读），
+        names 不为 None 时只通过索引刷新这些目录下的 skill，不遍历整个根目录。
+        只使用内存中的 tree，不访问网络。
+        扫描和本地 hash 在锁外进行，只有替换结果时持有锁，status 查询不会被大的扫描阻塞。
+        """
+        scanned = scan_skills(self.skills_root, names=names)
+        group_skills_by_repo(scanned, [])
+        with self._lock:
+            heads = {key: state['head'] for key, state in self.repos.items()}
+        for skill in scanned:
+            if skill.get('_github_info') and (not self.use_head_shortcut
+                                              or skill.get('local_hash') != heads.get(self._repo_key(skill))):
+                skill['_local_hashes'] = hash_file_batch(skill, list_local_files(skill))
+
+        with self._lock:
+            self.stats['rescans'] += 1
+            if names is None:
+                stale = set(self.skills)
+            else:
+                stale = set(os.path.join(self.skills_root, name) for name in names)
+            needs_poll = False
+            for skill in scanned:
+                stale.discard(skill['dir'])
+                self.skills[skill['dir']] = skill
+                # URL 无效的 skill 已由 group_skills_by_repo 标记为 error
+                if skill.get('_github_info'):
+                    state = self._repo_state(self._repo_key(skill))
+                    self._evaluate(skill, state)
+                    if skill['status'] == 'unknown':
+                        # 新仓库，或者该仓库的 tree 还没拉取过：尽快轮询
+                        state['next_poll'] = 0.0
+                        needs_poll = True
+            for skill_dir in stale:
+                self.skills.pop(skill_dir, None)
+            in_use = set(self._repo_key(s) for s in self.skills.values() if s.get('_github_info'))
+            for key in list(self.repos):
+                if key not in in_use:
+                    del self.repos[key]
+            self._publish()
+        get_skill_index(self.skills_root).flush()
+        if needs_poll:
+            self._wake.set()
+
+    def _repo_key(self, skill):
+        info = skill['_github_info']
+        return (info['owner'], info['repo'], info['branch'])
+
+    def _repo_state(self, key):
+        state = self.repos.get(key)
+        if state is None:
+            state = {'head': None, 'tree': None, 'tree_ref': None, 'interval': self.min_interval,
+                     'next_poll': 0.0, 'last_poll': None, 'polls': 0, 'changes': 0, 'error': None}
+            self.repos[key] = state
+        return state
+
+    def _needs_tree(self, skill, state):
+        return not self.use_head_shortcut or skill.get('local_hash') != state['head']
+
+    def _evaluate(self, skill, state):
+        """
+        用内存中的 HEAD / tree 评估单个 skill（调用方持有锁）。
+        本地 hash 使用 rescan / poll_repo 在锁外算好的 skill['_local_hashes']。
+        """
+        if state['error'] and state['head'] is None:
+            skill['status'] = 'error'
+            skill['message'] = f"Remote check failed: {state['error']}"
+            return
+        if state['head'] is None:
+            skill['status'] = 'unknown'
+            skill['message'] = 'Waiting for first upstream poll'
+            return
+        skill['remote_head'] = state['head']
+        if not self._needs_tree(skill, state):
+            skill['status'] = 'current'
+            skill['message'] = 'Up to date'
+            skill['reason'] = 'head_unchanged'
+        elif state['tree'] is not None and state['tree_ref'] == state['head']:
+            try:
+                # github_hash 处的 tree 只从 tree 缓存读取（poll_repo 负责拉取），锁内不访问网络
+                base_tree = fetch_base_tree(skill, state['head'], state['tree'], fetch=False)
+                evaluate_skill_update(skill, state['tree'], skill.get('_local_hashes'), base_tree)
+            except Exception as e:
+                skill['status'] = 'error'
+                skill['message'] = f"Evaluation error: {str(e)}"
+        else:
+            skill['status'] = 'unknown'
+            skill['message'] = 'Waiting for remote tree'
+
+    # ---- 上游轮询 ----
+
+    def resolve_heads(self, keys, errors=None):
+        """
+        一次解析多个仓库的 HEAD，返回 {key: sha}，失败的为 None（预算用完 / 限流的异常记入 errors）。
+        与检查引擎相同：有 GITHUB_TOKEN 时按批走 GraphQL，否则在线程池中并发请求。
+        """
+        async def resolve():
+            loop = asyncio.get_running_loop()
+
+            async def run(fn, *args):
+                return await loop.run_in_executor(self._executor, fn, *args)
+            return await resolve_repo_heads_async(list(keys), run, errors)
+        return asyncio.run(resolve())
+
+    def poll_repos(self, keys):
+        """轮询一组到期的仓库：批量解析 HEAD，再并发处理各仓库（只有 HEAD 变化的才拉取 tree）"""
+        errors = {}
+        try:
+            heads = self.resolve_heads(keys, errors)
+        except Exception as e:
+            print(f"Warning: resolving upstream heads failed: {e}", file=sys.stderr)
+            heads = {}
+
+        def poll(key):
+            try:
+                self.poll_repo(key, heads.get(key), errors.get(key))
+            except Exception as e:
+                print(f"Warning: polling {'/'.join(key)} failed: {e}", file=sys.stderr)
+        list(self._executor.map(poll, keys))
+
+    def poll_repo(self, key, head, error=None):
+        """
+        记录一个仓库新解析的 HEAD（None 表示解析失败，error 为失败原因），
+        变化时（且有 skill 需要时）拉取新 tree，并调整轮询间隔
+        """
+        owner, repo, branch = key
+        with self._lock:
+            state = self.repos.get(key)
+            if state is None:
+                return
+            state['polls'] += 1
+            state['last_poll'] = time.time()
+            self.stats['polls'] += 1
+            if head is None:
+                state['error'] = str(error) if error else 'Could not resolve branch HEAD'
+                state['interval'] = min(self.max_interval, state['interval'] * BACKOFF_FACTOR)
+            elif head != state['head']:
+                if state['head'] is not None:
+                    state['changes'] += 1
+                    self.stats['head_changes'] += 1
+                state['head'] = head
+                state['error'] = None
+                state['interval'] = self.min_interval
+            else:
+                state['error'] = None
+                state['interval'] = min(self.max_interval, state['interval'] * BACKOFF_FACTOR)
+            # 加一点抖动，避免所有仓库同时到期
+            state['next_poll'] = time.monotonic() + state['interval'] * random.uniform(0.9, 1.1)
+            repo_skills = [s for s in self.skills.values() if s.get('_github_info') and self._repo_key(s) == key]
+            tree_skills = [dict(s) for s in repo_skills if self._needs_tree(s, state)]
+            need_tree = head is not None and state['tree_ref'] != head and bool(tree_skills)
+
+        if need_tree:
+            try:
+                tree = fetch_remote_tree(owner, repo, head)
+                error = None
+            except Exception as e:
+                tree, error = None, str(e)
+            with self._lock:
+                state = self.repos.get(key)
+                if state is None:
+                    return
+                if error:
+                    state['error'] = error
+                else:
+                    # 每个仓库只保留当前 HEAD 的 tree
+                    state['tree'] = tree
+                    state['tree_ref'] = head
+                    self.stats['tree_fetches'] += 1
+            if tree is not None:
+                # 预先拉取各 skill github_hash 处的 tree（写入 tree 缓存），供 _evaluate 判断新增文件
+                for skill in tree_skills:
+                    fetch_base_tree(skill, head, tree)
+
+        # HEAD 变化后才需要逐文件对比的 skill，在锁外补算本地 hash
+        local_hashes = {}
+        if head is not None:
+            for skill in tree_skills:
+                if skill.get('_local_hashes') is None:
+                    local_hashes[skill['dir']] = hash_file_batch(skill, list_local_files(skill))
+
+        with self._lock:
+            state = self.repos.get(key)
+            if state is None:
+                return
+            for skill in self.skills.values():
+                if skill.get('_github_info') and self._repo_key(skill) == key:
+                    if skill.get('_local_hashes') is None and skill['dir'] in local_hashes:
+                        skill['_local_hashes'] = local_hashes[skill['dir']]
+                    self._evaluate(skill, state)
+                    if state['error'] and skill.get('status') == 'unknown':
+                        skill['status'] = 'error'
+                        skill['message'] = f"Remote check failed: {state['error']}"
+
+    def poll_loop(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            with self._lock:
+                due = [key for key, state in self.repos.items() if state['next_poll'] <= now]
+            if due:
+                self.poll_repos(due)
+            if self._stop.is_set():
+                return
+            with self._lock:
+                if due:
+                    get_skill_index(self.skills_root).flush()
+                    self._publish()
+                upcoming = [state['next_poll'] for state in self.repos.values()]
+            wait = (min(upcoming) - time.monotonic()) if upcoming else self.max_interval
+            self._wake.wait(timeout=max(0.0, min(wait, self.max_interval)))
+            self._wake.clear()
+
+    def refresh(self):
+        """让所有仓库立即到期"""
+        with self._lock:
+            for state in self.repos.values():
+                state['next_poll'] = 0.0
+        self._wake.set()
+
+    # ---- 状态输出 ----
+
+    def _publish(self):
+        """序列化当前状态（调用方持有锁），status 查询直接返回这份字节串"""
+        skills = sorted(self.skills.values(), key=lambda s: s['dir'])
+        skills = [{k: v for k, v in s.items() if not k.startswith('_')} for s in skills]
+        now = time.monotonic()
+        repos = []
+        for (owner, repo, branch), state in sorted(self.repos.items()):
+            repos.append({
+                'repo': f"{owner}/{repo}",
+                'branch': branch,
+                'head': state['head'],
+                'interval': state['interval'],
+                'next_poll_in': round(max(0.0, state['next_poll'] - now), 1),
+                'polls': state['polls'],
+                'changes': state['changes'],
+                'error': state['error']
+            })
+        output = {
+            "summary": {
+                "total": len(skills),
+                "outdated": sum(1 for s in skills if s.get('status') == 'outdated'),
+                "current": sum(1 for s in skills if s.get('status') == 'current'),
+                "errors": sum(1 for s in skills if s.get('status') == 'error'),
+                "pending": sum(1 for s in skills if s.get('status') == 'unknown')
+            },
+            "skills": skills,
+            "daemon": {
+                "pid": os.getpid(),
+                "skills_dir": self.skills_root,
+                "backend": get_backend(),
+                "watcher": 'inotify' if self.watcher else 'polling',
+                "started_at": self.started_at,
+                "updated_at": time.time(),
+                "stats": dict(self.stats),
+                "repos": repos
+            }
+        }
+        self._snapshot = json.dumps(output, indent=2).encode('utf-8')
+
+    def _handle_client(self, conn):
+        try:
+            conn.settimeout(CLIENT_TIMEOUT)
+            request = b''
+            while b'\n' not in request and len(request) < 1024:
+                chunk = conn.recv(1024)
+                if not chunk:
+                    break
+                request += chunk
+            command = request.decode('utf-8', 'replace').strip() or 'status'
+            if command == 'refresh':
+                self.refresh()
+                conn.sendall(json.dumps({"status": "refresh_scheduled"}).encode('utf-8'))
+            elif command == 'status':
+                conn.sendall(self._snapshot)
+            else:
+                conn.sendall(json.dumps({"error": f"Unknown command: {command}"}).encode('utf-8'))
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    # ---- 主循环 ----
+
+    def _open_socket(self):
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+                raise RuntimeError(f"Another daemon is already listening on {self.socket_path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                # 上次异常退出留下的 socket 文件
+                os.remove(self.socket_path)
+            finally:
+                probe.close()
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            server.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        server.listen(16)
+        server.setblocking(False)
+        return server
+
+    def stop(self, *args):
+        self._stop.set()
+        self._wake.set()
+
+    def run(self):
+        server = self._open_socket()
+        try:
+            self.watcher = InotifyWatcher(self.skills_root)
+            self.watcher.watch_skills()
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}), polling local files every {self.local_interval}s", file=sys.stderr)
+            self.watcher = None
+
+        self.rescan()
+        poller = threading.Thread(target=self.poll_loop, name="upstream-poller", daemon=True)
+        poller.start()
+
+        selector = selectors.DefaultSelector()
+        selector.register(server, selectors.EVENT_READ, 'socket')
+        if self.watcher:
+            selector.register(self.watcher.fd, selectors.EVENT_READ, 'inotify')
+
+        pending = set()
+        pending_since = None
+        last_local_scan = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                if pending_since is not None:
+                    timeout = max(0.0, pending_since + DEBOUNCE_SECONDS - time.monotonic())
+                elif self.watcher:
+                    timeout = 1.0
+                else:
+                    timeout = max(0.0, last_local_scan + self.local_interval - time.monotonic())
+                try:
+                    events = selector.select(timeout)
+                except InterruptedError:
+                    continue
+
+                for key, mask in events:
+                    if key.data == 'socket':
+                        try:
+                            conn, _ = server.accept()
+                        except (BlockingIOError, InterruptedError):
+                            continue
+                        conn.setblocking(True)
+                        self._handle_client(conn)
+                    elif key.data == 'inotify':
+                        affected = self.watcher.read()
+                        with self._lock:
+                            self.stats['local_events'] += 1
+                        if affected is None:
+                            self.watcher.watch_skills()
+                            pending = None
+                        elif pending is not None:
+                            pending.update(affected)
+                        if pending_since is None and (pending is None or pending):
+                            pending_since = time.monotonic()
+
+                now = time.monotonic()
+                if pending_since is not None and now - pending_since >= DEBOUNCE_SECONDS:
+                    self.rescan(pending)
+                    pending, pending_since = set(), None
+                elif not self.watcher and now - last_local_scan >= self.local_interval:
+                    self.rescan()
+                    last_local_scan = now
+        finally:
+            self.stop()
+            self._executor.shutdown(wait=False)
+            selector.close()
+            server.close()
+            if self.watcher:
+                self.watcher.close()
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+            get_skill_index(self.skills_root).flush()
+
+
+def query_daemon(socket_path, command='status'):
+    """向运行中的守护进程发送命令，返回解析后的 JSON"""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(10)
+    try:
+        client.connect(socket_path)
+        client.sendall(command.encode('utf-8') + b'\n')
+        chunks = []
+        while True:
+            chunk = client.recv(64 * 1024)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        client.close()
+    return json.loads(b''.join(chunks).decode('utf-8'))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="常驻检测 skill 更新，通过 Unix socket 提供状态")
+    parser.add_argument("skills_dir", nargs="?", default=get_default_skills_dir())
+    parser.add_argument("--socket", default=None,
+                        help=f"Unix socket 路径 (默认 <skills_dir>/.skill-manager/{SOCKET_FILENAME})")
+    parser.add_argument("--min-interval", type=float, default=DEFAULT_MIN_INTERVAL,
+                        help=f"上游 HEAD 最短轮询间隔，秒 (默认 {DEFAULT_MIN_INTERVAL})")
+    parser.add_argument("--max-interval", type=float, default=DEFAULT_MAX_INTERVAL,
+                        help=f"上游 HEAD 最长轮询间隔，秒 (默认 {DEFAULT_MAX_INTERVAL})")
+    parser.add_argument("--local-interval", type=float, default=DEFAULT_LOCAL_INTERVAL,
+                        help=f"inotify 不可用时重新扫描本地文件的间隔，秒 (默认 {DEFAULT_LOCAL_INTERVAL})")
+    parser.add_argument("--full", action="store_true",
+                        help="跳过 github_hash 与分支 HEAD 的快速比较，始终逐文件对比")
+    parser.add_argument("--backend", choices=BACKENDS, default=get_backend(),
+                        help=f"远程数据后端 (默认 {get_backend()})")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--status", action="store_true", help="查询运行中的守护进程并输出 JSON")
+    mode.add_argument("--refresh", action="store_true", help="让运行中的守护进程立即轮询所有上游仓库")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    skills_dir = os.path.abspath(args.skills_dir)
+    socket_path = args.socket or os.path.join(get_state_dir(skills_dir), SOCKET_FILENAME)
+
+    if args.status or args.refresh:
+        try:
+            result = query_daemon(socket_path, 'refresh' if args.refresh else 'status')
+        except (OSError, ValueError) as e:
+            print(json.dumps({"error": f"Daemon not reachable at {socket_path}: {e}"}))
+            sys.exit(1)
+        print(json.dumps(result, indent=2))
+        return
+
+    if not os.path.isdir(skills_dir):
+        print(json.dumps({"error": f"Skills directory not found: {skills_dir}"}))
+        sys.exit(1)
+
+    set_backend(args.backend)
+    os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+    daemon = WatchDaemon(
+        skills_dir, socket_path,
+        min_interval=args.min_interval,
+        max_interval=args.max_interval,
+        local_interval=args.local_interval,
+        use_head_shortcut=not args.full
+    )
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    try:
+        daemon.run()
+    except RuntimeError as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()